@@ -0,0 +1,100 @@
+"""Password hashing benchmark.
+
+    python -m benchmarks.hashing --threads 16 --hashes 8 --workers 0 2 4
+
+For every pool size runs a burst of concurrent password checks through
+PasswordHasher and, at the same time, a probe thread doing small pieces
+of pure Python work, the stand-in for the other requests a worker serves.
+Reports hash throughput and latency plus the probe latency, which shows
+how much an auth storm slows down the rest of the process.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from werkzeug.security import generate_password_hash
+from einesteine.hashing import PasswordHasher
+from benchmarks.run import percentile
+
+
+
+PASSWORD = 'benchmark'
+
+
+def probe(stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        sum(i * i for i in range(2000))
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.001)
+
+def start_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+def probe_during(action):
+    samples = []
+    stop = threading.Event()
+    probe_thread = threading.Thread(target=probe, args=(stop, samples))
+    probe_thread.start()
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    probe_thread.join()
+    return samples, elapsed
+
+def milliseconds(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {'p50_ms' : round(percentile(values, 0.50) * 1000, 3),
+            'p95_ms' : round(percentile(values, 0.95) * 1000, 3),
+            'p99_ms' : round(percentile(values, 0.99) * 1000, 3)}
+
+def run(hasher, password_hash, threads, hashes):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        for i in range(hashes):
+            start = time.perf_counter()
+            hasher.verify(password_hash, PASSWORD)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    idle, elapsed = probe_during(lambda: time.sleep(0.2))
+    busy, wall_time = probe_during(lambda: [thread.join() for thread in [start_thread(worker) for i in range(threads)]])
+    return {'hashes' : len(latencies),
+            'hashes_per_second' : round(len(latencies) / wall_time, 1),
+            'hash' : milliseconds(latencies),
+            'probe_idle' : milliseconds(idle),
+            'probe_busy' : milliseconds(busy)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark password hashing under a login burst.')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent password checks')
+    parser.add_argument('--hashes', type=int, default=4, help='password checks per thread')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4], help='pool sizes to compare, 0 is inline')
+    parser.add_argument('--method', default='pbkdf2:sha256:260000')
+    args = parser.parse_args(argv)
+
+    password_hash = generate_password_hash(PASSWORD, args.method)
+    report = {'parameters' : {'threads' : args.threads, 'hashes' : args.hashes, 'method' : args.method}, 'results' : {}}
+    for workers in args.workers:
+        hasher = PasswordHasher()
+        hasher.method = args.method
+        hasher.workers = workers
+        hasher.verify(password_hash, PASSWORD)
+        report['results'][f'workers={workers}'] = run(hasher, password_hash, args.threads, args.hashes)
+        hasher.shutdown()
+    print(json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Memory benchmark of the list views.
+
+    python -m benchmarks.memory --ideas 2000 --requests 50
+
+Seeds a temporary SQLite database and, for every page, starts a fresh
+interpreter that logs in and serves the page with the response cache
+off. Peak RSS is taken from a run without tracing; then tracemalloc
+reports the bytes allocated at the peak of each request and the bytes
+still held once it returned.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+from benchmarks.seed import PASSWORD, make_app, seed, temporary_database
+
+
+
+PAGES = {'board' : '/board',
+         'board_filtered' : '/board/filtered/{tag}/none',
+         'get_ideas' : '/get_ideas/none/none?page=2',
+         'get_ideas_v2' : '/get_ideas/none/none?page=2&v=2'}
+
+
+def peak_rss_kib():
+    # ru_maxrss survives exec on Linux and would report the seeding parent
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def probe_app(database_path):
+    return make_app(database_path, PASSWORD_HASH_WORKERS=0, CACHE_BACKEND='null', PROFILING_ENABLED=False)
+
+def probe(database_path, path, requests):
+    app = probe_app(database_path)
+    client = app.test_client()
+    client.post('/login', data={'username' : 'bench0', 'password' : PASSWORD})
+    assert client.get(path).status_code == 200
+    for i in range(requests):
+        client.get(path)
+    rss_kib = peak_rss_kib()
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    for i in range(requests):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        client.get(path)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+    tracemalloc.stop()
+    peaks.sort()
+    return {'peak_rss_kib' : rss_kib,
+            'request_peak_kib' : round(peaks[len(peaks) // 2] / 1024, 1),
+            'request_peak_max_kib' : round(peaks[-1] / 1024, 1),
+            'retained_per_request_b' : round(sum(retained) / len(retained))}
+
+def run_probe(database_path, path, requests):
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.memory', '--probe', database_path, path, '--requests', str(requests)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure memory use of the list views.')
+    parser.add_argument('--ideas', type=int, default=2000, help='ideas of the benchmark user')
+    parser.add_argument('--posts', type=int, default=5, help='average posts per idea')
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=50, help='requests per page')
+    parser.add_argument('--probe', nargs=2, metavar=('DATABASE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe(*args.probe, args.requests)))
+        return 0
+
+    database_path = temporary_database()
+    app = probe_app(database_path)
+    seed(app, users=1, ideas=args.ideas, posts=args.posts, tags=args.tags)
+    with app.app_context():
+        from einesteine.models import Tag
+        tag = Tag.query.order_by(Tag.idea_count.desc()).first().name
+    report = {'parameters' : {'ideas' : args.ideas, 'posts' : args.posts, 'tags' : args.tags, 'requests' : args.requests},
+              'results' : {name : run_probe(database_path, path.format(tag=tag), args.requests) for name, path in PAGES.items()}}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Idea numbering stress test.
+
+    python -m benchmarks.numbering --threads 8 --ideas 25
+
+Every thread logs in as the same user with its own client and opens the
+empty editor, which creates an idea, as fast as it can. Reports the
+throughput, failed requests and conflict retries, then checks the user's
+new ideas got every number exactly once.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from benchmarks.seed import PASSWORD, make_app, temporary_database, seed
+from einesteine import db
+from einesteine.database import retries
+from einesteine.models import User, Idea
+
+
+
+def run(app, threads, ideas):
+    clients = []
+    for number in range(threads):
+        client = app.test_client()
+        client.post('/login', data={'username' : 'bench0', 'password' : PASSWORD})
+        clients.append(client)
+    statuses = {}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(client):
+        start_barrier.wait()
+        for i in range(ideas):
+            status = client.get('/editor').status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    workers = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return statuses, time.perf_counter() - start
+
+def check(app, existing):
+    with app.app_context():
+        user = User.query.filter_by(username='bench0').one()
+        numbers = [number for number, in db.session.query(Idea.number).filter(Idea.user_id == user.id).order_by(Idea.number)]
+        created = numbers[existing:]
+        return {'created' : len(created),
+                'duplicates' : len(numbers) - len(set(numbers)),
+                'contiguous' : created == list(range(existing + 1, existing + 1 + len(created))),
+                'last_idea_id' : user.last_idea_id}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Open the empty editor concurrently and check idea numbers stay unique.')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ideas', type=int, default=25, help='ideas created per thread')
+    parser.add_argument('--existing', type=int, default=50, help='ideas the user already has')
+    args = parser.parse_args(argv)
+
+    app = make_app(temporary_database(), PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_PER_CLIENT=0)
+    seed(app, users=1, ideas=args.existing, posts=1, tags=5)
+    statuses, wall_time = run(app, args.threads, args.ideas)
+    requests = sum(statuses.values())
+    result = check(app, args.existing)
+    report = {'parameters' : {'threads' : args.threads, 'ideas' : args.ideas, 'existing' : args.existing},
+              'requests' : requests,
+              'ideas_per_second' : round(requests / wall_time, 1),
+              'statuses' : {str(status) : count for status, count in sorted(statuses.items())},
+              'retries' : dict(retries),
+              'numbers' : result}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    expected = args.threads * args.ideas
+    return 0 if result['created'] == expected and not result['duplicates'] and result['contiguous'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Load and benchmark suite for the board and editor flows.
+
+    python -m benchmarks.run --users 5 --ideas 2000 --requests 200 --threads 8
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+Seeds a temporary SQLite database, drives the real endpoints through the
+Flask test client and through a threaded HTTP load generator, prints the
+report as JSON and exits with status 1 when a baseline is given and a
+scenario regressed against it.
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from werkzeug.serving import make_server, WSGIRequestHandler
+from einesteine import db
+from einesteine.models import User, Tag, Idea
+from benchmarks.seed import PASSWORD, make_app, seed, temporary_database
+
+
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Scenario(object):
+    """One user flow; next_request() returns (method, path, json body)."""
+
+    def __init__(self, fixture, generator):
+        self.fixture = fixture
+        self.generator = generator
+
+    def idea_id(self):
+        return self.generator.choice(self.fixture['ideas'])
+
+
+class Board(Scenario):
+    name = 'board'
+
+    def next_request(self):
+        return 'GET', '/board', None
+
+
+class GetIdeas(Scenario):
+    name = 'get_ideas'
+    cursor = None
+
+    def next_request(self):
+        return 'POST', '/get_ideas/none/none', [{'cursor' : self.cursor} if self.cursor else {'next_page' : 2}]
+
+    def handle(self, body):
+        self.cursor = json.loads(body).get('next_cursor')
+
+
+class Editor(Scenario):
+    name = 'editor'
+
+    def next_request(self):
+        return 'GET', f'/editor/{self.idea_id()}', None
+
+
+class UpdateIdea(Scenario):
+    name = 'update_idea'
+
+    def next_request(self):
+        idea_id = self.idea_id()
+        return 'POST', '/update_idea', [{'idea_id' : idea_id, 'name' : f'Idea {idea_id}', 'completed' : False,
+                                         'text' : 'benchmark post', 'date' : '01.01.2023 12:00'}]
+
+
+class Connect(Scenario):
+    name = 'connect'
+    connected = False
+
+    def __init__(self, fixture, generator):
+        super().__init__(fixture, generator)
+        self.target = (self.idea_id(), generator.choice(fixture['tags']))
+
+    def next_request(self):
+        self.connected = not self.connected
+        action = 'connect' if self.connected else 'disconnect'
+        return 'POST', f'/{action}/{self.target[0]}/{self.target[1]}', None
+
+
+SCENARIOS = (Board, GetIdeas, Editor, UpdateIdea, Connect)
+
+
+class ClientSession(object):
+    def __init__(self, app, username):
+        self.client = app.test_client()
+        self.client.post('/login', data={'username' : username, 'password' : PASSWORD})
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.headers.get('Server-Timing', ''), response.get_data()
+
+
+class HttpSession(object):
+    def __init__(self, base_url, username):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        data = urllib.parse.urlencode({'username' : username, 'password' : PASSWORD}).encode()
+        self.opener.open(base_url + '/login', data).read()
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type' : 'application/json'})
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.headers.get('Server-Timing', ''), response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('Server-Timing', ''), error.read()
+
+
+class Recorder(object):
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def run(self, session, scenario):
+        method, path, body = scenario.next_request()
+        start = time.perf_counter()
+        status, timing, data = session.request(method, path, body)
+        elapsed = time.perf_counter() - start
+        match = SERVER_TIMING_QUERIES.search(timing)
+        if status == 200 and hasattr(scenario, 'handle'):
+            scenario.handle(data)
+        with self.lock:
+            self.samples.setdefault(scenario.name, []).append((elapsed, int(match.group(1)) if match else 0, status))
+
+    def report(self, wall_time):
+        return {name : summarize(samples, wall_time.get(name)) for name, samples in sorted(self.samples.items())}
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+def summarize(samples, wall_time=None):
+    latencies = sorted(elapsed for elapsed, queries, status in samples)
+    total = wall_time if wall_time is not None else sum(latencies)
+    return {'requests' : len(samples),
+            'errors' : sum(1 for elapsed, queries, status in samples if status >= 400),
+            'mean_ms' : round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50_ms' : round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms' : round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms' : round(percentile(latencies, 0.99) * 1000, 3),
+            'throughput_rps' : round(len(samples) / total, 1) if total else 0.0,
+            'queries_per_request' : round(sum(queries for elapsed, queries, status in samples) / len(samples), 2)}
+
+
+def load_fixtures(app, usernames):
+    fixtures = {}
+    with app.app_context():
+        for username in usernames:
+            user = User.query.filter_by(username=username).first()
+            fixtures[username] = {'ideas' : [idea_id for idea_id, in db.session.query(Idea.id).filter(Idea.user_id == user.id)],
+                                  'tags' : [tag_id for tag_id, in db.session.query(Tag.id).filter(Tag.user_id == user.id)]}
+    return fixtures
+
+def run_client(app, usernames, fixtures, requests):
+    recorder = Recorder()
+    wall_time = {}
+    generator = random.Random(1)
+    for scenario_class in SCENARIOS:
+        username = usernames[0]
+        session = ClientSession(app, username)
+        scenario = scenario_class(fixtures[username], generator)
+        start = time.perf_counter()
+        for i in range(requests):
+            recorder.run(session, scenario)
+        wall_time[scenario.name] = time.perf_counter() - start
+    return recorder.report(wall_time)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def run_http(app, usernames, fixtures, requests, threads):
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    recorder = Recorder()
+
+    def worker(number):
+        username = usernames[number % len(usernames)]
+        generator = random.Random(number)
+        session = HttpSession(base_url, username)
+        scenarios = [scenario_class(fixtures[username], generator) for scenario_class in SCENARIOS]
+        for i in range(requests):
+            recorder.run(session, scenarios[i % len(scenarios)])
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall_time = time.perf_counter() - start
+    server.shutdown()
+    report = recorder.report({name : wall_time for name in recorder.samples})
+    report['total'] = summarize([sample for samples in recorder.samples.values() for sample in samples], wall_time)
+    return report
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for mode, scenarios in baseline.get('results', {}).items():
+        for name, expected in scenarios.items():
+            current = report['results'].get(mode, {}).get(name)
+            if current is None:
+                continue
+            for key in ('p50_ms', 'p95_ms'):
+                if current[key] > expected[key] * (1 + tolerance) and current[key] - expected[key] > min_delta_ms:
+                    regressions.append(f'{mode}/{name}: {key} {expected[key]} -> {current[key]}')
+            if current['queries_per_request'] > expected['queries_per_request'] + 0.5:
+                regressions.append(f"{mode}/{name}: queries_per_request {expected['queries_per_request']} -> {current['queries_per_request']}")
+            if current['errors'] > expected['errors']:
+                regressions.append(f"{mode}/{name}: errors {expected['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the board and editor flows.')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--ideas', type=int, default=500, help='ideas per user')
+    parser.add_argument('--posts', type=int, default=5, help='average posts per idea')
+    parser.add_argument('--tags', type=int, default=20, help='tags per user')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario (client) or per thread (http)')
+    parser.add_argument('--threads', type=int, default=8, help='HTTP load generator threads, 0 to skip')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='compare against this report and fail on regressions')
+    parser.add_argument('--save-baseline', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative latency increase')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore latency changes smaller than this')
+    args = parser.parse_args(argv)
+
+    overrides = {'CACHE_BACKEND' : 'null'} if args.no_cache else {}
+    app = make_app(temporary_database(), **overrides)
+    seed_start = time.perf_counter()
+    usernames = seed(app, args.users, args.ideas, args.posts, args.tags)
+    fixtures = load_fixtures(app, usernames)
+    report = {'parameters' : {key : getattr(args, key) for key in ('users', 'ideas', 'posts', 'tags', 'requests', 'threads', 'no_cache')},
+              'seed_seconds' : round(time.perf_counter() - seed_start, 2),
+              'results' : {'client' : run_client(app, usernames, fixtures, args.requests)}}
+    if args.threads:
+        report['results']['http'] = run_http(app, usernames, fixtures, args.requests, args.threads)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as file:
+                file.write(output + '\n')
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
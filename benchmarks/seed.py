@@ -0,0 +1,82 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from einesteine import create_app, db, search
+from einesteine.config import Config
+from einesteine.models import User, Tag, Idea, Post, tag_connections, refresh_counters, STAGE_NEW, STAGE_COMPLETE
+
+
+
+PASSWORD = 'benchmark'
+START_TIME = datetime(2022, 1, 1)
+WORDS = ('идея', 'проект', 'заметка', 'план', 'задача', 'код', 'дизайн', 'релиз', 'тест', 'сервер',
+         'idea', 'project', 'note', 'plan', 'task', 'draft', 'review', 'release', 'bench', 'search')
+
+
+class BenchmarkConfig(Config):
+    WTF_CSRF_ENABLED = False
+    PROFILING_ENABLED = True
+    PROFILING_SLOW_REQUEST = float('inf')
+    PROFILING_QUERY_WARNING = 10 ** 6
+    # the load generator is one user far above any human rate
+    RATELIMIT_BACKEND = 'null'
+
+
+def make_app(database_path, **overrides):
+    config = type('Config', (BenchmarkConfig,), dict(SQLALCHEMY_DATABASE_URI='sqlite:///' + database_path, **overrides))
+    return create_app(config)
+
+def temporary_database():
+    directory = tempfile.mkdtemp(prefix='einesteine-bench-')
+    return os.path.join(directory, 'bench.db')
+
+def seed(app, users=5, ideas=500, posts=5, tags=20, seed=1):
+    """Fill an empty database, returns the list of usernames.
+
+    Every user gets `ideas` ideas, on average `posts` posts per idea and
+    `tags` tags with up to three tags per idea.
+    """
+    generator = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD)
+    usernames = []
+    with app.app_context():
+        db.create_all(bind=None)
+        if search.is_supported():
+            with db.engine.begin() as connection:
+                search.create_index(connection)
+        for number in range(users):
+            username = f'bench{number}'
+            user = User(username=username, email=f'{username}@example.com', password_hash=password_hash,
+                        register_time=START_TIME, last_idea_id=ideas + 1)
+            db.session.add(user)
+            db.session.flush()
+            db.session.execute(Tag.__table__.insert(), [{'name' : f'tag{i}', 'user_id' : user.id, 'idea_count' : 0} for i in range(tags)])
+            tag_ids = [tag_id for tag_id, in db.session.query(Tag.id).filter(Tag.user_id == user.id)]
+            rows = []
+            for i in range(ideas):
+                complete = generator.random() < 0.2
+                rows.append({'name' : f'Idea {i} of {username}', 'number' : i + 1, 'complete' : complete,
+                             'stage' : STAGE_COMPLETE if complete else STAGE_NEW, 'post_count' : 0,
+                             'created_time' : START_TIME + timedelta(minutes=i), 'user_id' : user.id})
+            db.session.execute(Idea.__table__.insert(), rows)
+            idea_ids = [idea_id for idea_id, in db.session.query(Idea.id).filter(Idea.user_id == user.id)]
+            post_rows = []
+            connection_rows = []
+            for idea_id in idea_ids:
+                for j in range(generator.randint(0, posts * 2)):
+                    post_rows.append({'body' : ' '.join(generator.choice(WORDS) for word in range(40)),
+                                      'created_time' : START_TIME + timedelta(days=1, minutes=idea_id * 10 + j),
+                                      'idea_id' : idea_id, 'user_id' : user.id})
+                for tag_id in generator.sample(tag_ids, min(len(tag_ids), generator.randint(0, 3))):
+                    connection_rows.append({'tagged_id' : idea_id, 'tag_id' : tag_id})
+            if post_rows:
+                db.session.execute(Post.__table__.insert(), post_rows)
+            if connection_rows:
+                db.session.execute(tag_connections.insert(), connection_rows)
+            refresh_counters(user.id)
+            db.session.commit()
+            usernames.append(username)
+    return usernames
+
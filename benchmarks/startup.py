@@ -0,0 +1,71 @@
+"""Cold start benchmark.
+
+    python -m benchmarks.startup --runs 10
+
+Every run is a fresh interpreter that imports the package, builds the app
+and serves its first request, the path a forked worker or a test process
+takes. Reports the median and worst time of each phase in milliseconds
+and the number of modules loaded, plus the cold start of a CLI command.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import einesteine
+imported = time.perf_counter()
+app = einesteine.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/login')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import_ms' : (imported - start) * 1000,
+                  'create_app_ms' : (created - imported) * 1000,
+                  'first_request_ms' : (served - created) * 1000,
+                  'total_ms' : (served - start) * 1000,
+                  'modules' : len(sys.modules)}))
+'''
+
+
+def probe(environment):
+    output = subprocess.run([sys.executable, '-c', PROBE], env=environment, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def cli_start(environment):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'flask', 'jobs', '--help'], env=environment, check=True, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+def summarize(values):
+    return {'median' : round(statistics.median(values), 1), 'max' : round(max(values), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure cold start of the application.')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    environment = dict(os.environ, FLASK_APP='einesteine')
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')]))
+    probe(environment)
+    samples = [probe(environment) for run in range(args.runs)]
+    cli = [cli_start(environment) for run in range(args.runs)]
+    report = {'runs' : args.runs,
+              'python' : sys.version.split()[0],
+              'app' : {key : summarize([sample[key] for sample in samples]) for key in samples[0]},
+              'cli_ms' : summarize(cli)}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
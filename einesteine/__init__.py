@@ -1,14 +1,62 @@
+import os
+import click
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from einesteine.config import Config
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from einesteine.database import RoutingSQLAlchemy
 from flask_login import LoginManager
+from einesteine.cache import ResponseCache
+from einesteine.profiling import Profiler
+from einesteine.hashing import PasswordHasher
+from einesteine.events import EventBroker
+from einesteine.throttling import RateLimiter, Coalescer
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
-login.login_view = 'login'
+db = RoutingSQLAlchemy()
+login = LoginManager()
+login.login_view = 'main.login'
+cache = ResponseCache()
+fragments = ResponseCache(prefix='FRAGMENT_CACHE', name='fragment_cache')
+profiler = Profiler()
+hasher = PasswordHasher()
+broker = EventBroker()
+limiter = RateLimiter()
+coalescer = Coalescer()
 
-from einesteine import routes, models, forms
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    if app.config['JINJA_BYTECODE_CACHE']:
+        directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(directory))
+
+    from einesteine import database, models
+    db.init_app(app)
+    database.init_app(app, db)
+    login.init_app(app)
+    cache.init_app(app)
+    fragments.init_app(app)
+    hasher.init_app(app)
+    broker.init_app(app, db)
+    limiter.init_app(app)
+    coalescer.init_app(app)
+    profiler.init_app(app, db)
+
+    from einesteine.routes import bp as main_bp
+    app.register_blueprint(main_bp)
+
+    # workers and tests never run commands, only pay for Alembic and the
+    # command modules when the app is built by the flask CLI
+    if click.get_current_context(silent=True) is not None:
+        init_cli(app)
+
+    return app
+
+def init_cli(app):
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+    from einesteine import cli
+    cli.register(app)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+
+class LRUBackend(object):
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class NullBackend(object):
+    def __init__(self, maxsize=0, ttl=0):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+BACKENDS = {'lru' : LRUBackend, 'null' : NullBackend}
+
+
+class ResponseCache(object):
+    """Per-user cache of rendered pages.
+
+    Keys embed the user's data_version, which every write route bumps in
+    its own transaction, so a write makes all older entries unreachable.
+    """
+
+    def __init__(self, app=None, prefix='CACHE', name='response_cache'):
+        self.backend = NullBackend()
+        self.prefix = prefix
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get(f'{self.prefix}_BACKEND', 'lru')
+        if isinstance(backend, str):
+            backend = BACKENDS[backend]
+        self.backend = backend(maxsize=app.config.get(f'{self.prefix}_SIZE', 512), ttl=app.config.get(f'{self.prefix}_TTL', 300))
+        app.extensions[self.name] = self
+
+    def user_key(self, user, *parts):
+        return (user.id, user.data_version) + parts
+
+    def cached(self, key, factory):
+        value = self.backend.get(key)
+        with self.lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None:
+            return value
+        value = factory()
+        self.backend.set(key, value)
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        requests = hits + misses
+        return {'backend' : type(self.backend).__name__,
+                'size' : len(self.backend),
+                'hits' : hits,
+                'misses' : misses,
+                'hit_ratio' : hits / requests if requests else 0.0}
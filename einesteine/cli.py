@@ -0,0 +1,108 @@
+import click
+import json
+import time
+from einesteine import db, database, search, transfer, jobs
+from einesteine.models import User, Job
+
+
+
+def register(app):
+    @app.cli.group('search')
+    def search_group():
+        """Full-text search index commands."""
+        pass
+
+    @search_group.command()
+    @click.option('--queue', is_flag=True, help='Run the rebuild as a background job.')
+    def rebuild(queue):
+        """Drop and rebuild the full-text search index."""
+        if not search.is_supported():
+            raise click.ClickException('Full-text search requires an SQLite database.')
+        if queue:
+            job = jobs.enqueue('rebuild_index')
+            db.session.commit()
+            click.echo(f'Queued job {job.id}.')
+            return
+        search.rebuild_index()
+        click.echo('Search index rebuilt.')
+
+    @app.cli.group('transfer')
+    def transfer_group():
+        """Import and export of a user's ideas as JSON Lines."""
+        pass
+
+    @transfer_group.command('export')
+    @click.argument('username')
+    @click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+    def export_command(username, output):
+        """Export all ideas, posts and tags of USERNAME."""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'No such user: {username}')
+        for line in transfer.export_lines(user):
+            output.write(line)
+
+    @transfer_group.command('import')
+    @click.argument('username')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--batch-size', default=transfer.IMPORT_BATCH, show_default=True)
+    def import_command(username, source, batch_size):
+        """Import a JSON Lines export into the account of USERNAME."""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'No such user: {username}')
+        try:
+            stats = transfer.import_lines(user, source, batch_size)
+        except transfer.TransferError as error:
+            db.session.rollback()
+            raise click.ClickException(str(error))
+        db.session.commit()
+        click.echo(', '.join(f'{count} {kind}' for kind, count in stats.items()) + ' imported.')
+
+    @app.cli.group('jobs')
+    def jobs_group():
+        """Background job queue commands."""
+        pass
+
+    @jobs_group.command()
+    @click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+    def worker(once):
+        """Run queued jobs."""
+        try:
+            jobs.work(once=once)
+        except KeyboardInterrupt:
+            pass
+
+    @jobs_group.command('list')
+    @click.option('--limit', default=20, show_default=True)
+    def list_command(limit):
+        """Show the most recent jobs."""
+        for job in Job.query.order_by(Job.id.desc()).limit(limit):
+            click.echo(json.dumps(jobs.describe(job), ensure_ascii=False))
+
+    @app.cli.group('replica')
+    def replica_group():
+        """Read replica commands."""
+        pass
+
+    @replica_group.command()
+    @click.option('--interval', type=float, help='Keep copying every INTERVAL seconds.')
+    def sync(interval):
+        """Copy the primary SQLite database into the replica file.
+
+        A local stand-in for replication: run with --interval next to the
+        app and REPLICA_DATABASE_URL pointing at the copy.
+        """
+        binds = app.config['SQLALCHEMY_BINDS'] or {}
+        if database.REPLICA not in binds:
+            raise click.ClickException('No replica configured, set REPLICA_DATABASE_URL.')
+        if not database.is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']) or not database.is_sqlite(binds[database.REPLICA]):
+            raise click.ClickException('Only SQLite databases can be copied.')
+        if database.sqlite_path(app.config['SQLALCHEMY_DATABASE_URI']) == database.sqlite_path(binds[database.REPLICA]):
+            raise click.ClickException('The replica is the primary database opened read-only.')
+        while True:
+            database.sync_replica(app)
+            click.echo('Replica synced.')
+            if interval is None:
+                return
+            time.sleep(interval)
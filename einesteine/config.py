@@ -5,3 +5,61 @@ class Config(object):
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'SUPER_SECRET_PASSWORD_ASFMEFKVMADSLCLASDP[LEFWFWDASCDSCSDC'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = None
+    # read_only views are served by the 'replica' bind; an SQLite replica is opened with mode=ro
+    SQLALCHEMY_BINDS = {'replica' : os.environ['REPLICA_DATABASE_URL']} if os.environ.get('REPLICA_DATABASE_URL') else None
+    REPLICA_READ_ONLY_PRIMARY = bool(os.environ.get('REPLICA_READ_ONLY_PRIMARY'))
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS') or 5)
+    # retry_on_conflict views run again after a unique key or lock conflict, with jittered exponential backoff
+    WRITE_RETRIES = int(os.environ.get('WRITE_RETRIES') or 3)
+    WRITE_RETRY_DELAY = float(os.environ.get('WRITE_RETRY_DELAY') or 0.05)
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10)
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800)
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT') or 30)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'lru'
+    CACHE_SIZE = int(os.environ.get('CACHE_SIZE') or 512)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL') or 300)
+    # rendered idea cards, keyed by their content so they never go stale
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND') or 'lru'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 4096)
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL') or 3600)
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE') != '0'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    BATCH_MAX_OPERATIONS = 100
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND') or 'memory'
+    EVENTS_QUEUE_SIZE = 256
+    EVENTS_KEEPALIVE = int(os.environ.get('EVENTS_KEEPALIVE') or 15)
+    EVENTS_MAX_AGE = int(os.environ.get('EVENTS_MAX_AGE') or 300)
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'memory'
+    RATELIMIT_SIZE = 10000
+    RATELIMIT_LIMITS = {'main.update_idea' : (2, 20),
+                        'main.batch' : (2, 20),
+                        'main.add_tag' : (0.5, 10)}
+    COALESCE_WINDOW = float(os.environ.get('COALESCE_WINDOW') or 0.05)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:260000'
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 10)
+    PASSWORD_HASH_PER_CLIENT = int(os.environ.get('PASSWORD_HASH_PER_CLIENT') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 32)
+    JOBS_CHUNK_SIZE = int(os.environ.get('JOBS_CHUNK_SIZE') or 500)
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL') or 1.0)
+    # a running job without a heartbeat for this many seconds goes back to the queue
+    JOBS_TIMEOUT = int(os.environ.get('JOBS_TIMEOUT') or 600)
+    JOBS_MAX_ATTEMPTS = 3
+    JOBS_WORKER_THREADS = int(os.environ.get('JOBS_WORKER_THREADS') or 0)
+    JOBS_EXPORT_DIR = os.environ.get('JOBS_EXPORT_DIR') or os.path.join(os.path.dirname(basedir), 'exports')
+    PROFILING_ENABLED = bool(os.environ.get('PROFILING_ENABLED'))
+    PROFILING_CPROFILE = bool(os.environ.get('PROFILING_CPROFILE'))
+    PROFILING_SLOW_REQUEST = float(os.environ.get('PROFILING_SLOW_REQUEST') or 0.5)
+    PROFILING_QUERY_WARNING = int(os.environ.get('PROFILING_QUERY_WARNING') or 25)
+    PROFILING_SLOWEST_STATEMENTS = 5
+    PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR') or os.path.join(os.path.dirname(basedir), 'profiles')
@@ -0,0 +1,191 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, session, has_request_context
+from flask_login import current_user
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+import sqlalchemy as sqla
+from sqlalchemy import event, orm
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+
+
+REPLICA = 'replica'
+CONFLICT_PGCODES = ('40001', '40P01')
+
+retries = {}
+retries_lock = threading.Lock()
+
+
+class RoutingSession(SignallingSession):
+    """Sends the reads of read_only() views to the replica bind.
+
+    Flushes and UPDATE/INSERT/DELETE statements always go to the primary,
+    and once the session wrote so does every later read.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+        elif self.info.get(REPLICA) is not None and not self.info.get('wrote'):
+            return self.info[REPLICA]
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # SQLite URI filenames (file:...?mode=ro) are not paths relative to the app
+        database = sa_url.database
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if database and database.startswith('file:'):
+            sa_url = sa_url.set(database=database)
+        return sa_url, options
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def sqlite_path(uri):
+    database = make_url(uri).database
+    if database.startswith('file:'):
+        database = database[len('file:'):].split('?', 1)[0]
+    return database
+
+def read_only_url(uri):
+    """The same SQLite file opened with mode=ro, other databases are left alone."""
+    url = make_url(uri)
+    if not is_sqlite(uri) or url.database in (None, '', ':memory:') or url.database.startswith('file:'):
+        return uri
+    path = os.path.abspath(url.database)
+    return str(url.set(database=f'file:{path}', query=dict(url.query, mode='ro', uri='true')))
+
+def engine_options(config):
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return {'connect_args' : {'timeout' : config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    return {'pool_size' : config['DATABASE_POOL_SIZE'],
+            'max_overflow' : config['DATABASE_MAX_OVERFLOW'],
+            'pool_recycle' : config['DATABASE_POOL_RECYCLE'],
+            'pool_timeout' : config['DATABASE_POOL_TIMEOUT'],
+            'pool_pre_ping' : True}
+
+def sqlite_pragmas(config):
+    return [f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+            f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+            f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+            f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}"]
+
+def replica_binds(config):
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    primary = config['SQLALCHEMY_DATABASE_URI']
+    if REPLICA not in binds and config.get('REPLICA_READ_ONLY_PRIMARY') and is_sqlite(primary):
+        binds[REPLICA] = primary
+    if REPLICA in binds:
+        binds[REPLICA] = read_only_url(binds[REPLICA])
+    return binds
+
+def pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return set_pragmas
+
+def init_app(app, db):
+    if app.config.get('SQLALCHEMY_ENGINE_OPTIONS') is None:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    binds = replica_binds(app.config)
+    app.config['SQLALCHEMY_BINDS'] = binds or None
+    if not event.contains(db.session, 'after_commit', remember_write):
+        event.listen(db.session, 'after_commit', remember_write)
+    with app.app_context():
+        if REPLICA in binds and is_sqlite(binds[REPLICA]):
+            # journal mode and synchronous belong to the writer
+            replica_pragmas = sqlite_pragmas(app.config)[2:] + ['PRAGMA query_only=ON']
+            event.listen(db.get_engine(app, REPLICA), 'connect', pragma_listener(replica_pragmas))
+        if is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+            event.listen(db.engine, 'connect', pragma_listener(sqlite_pragmas(app.config)))
+
+
+def remember_write(db_session):
+    if db_session.info.get('wrote') and has_request_context():
+        session['wrote_at'] = int(time.time())
+
+def use_replica(db):
+    """The replica serves this request unless the user wrote within
+    REPLICA_STICKY_SECONDS or the replica has not caught up with the
+    user's data_version yet."""
+    if REPLICA not in (current_app.config['SQLALCHEMY_BINDS'] or {}) or not current_user.is_authenticated:
+        return False
+    if time.time() - session.get('wrote_at', 0) < current_app.config['REPLICA_STICKY_SECONDS']:
+        return False
+    from einesteine.models import User
+    replica = db.get_engine(current_app, REPLICA)
+    try:
+        with replica.connect() as connection:
+            version = connection.execute(sqla.select(User.data_version).where(User.id == current_user.id)).scalar()
+    except sqla.exc.DBAPIError:
+        current_app.logger.warning('Replica unavailable, reading from the primary', exc_info=True)
+        return False
+    if version != current_user.data_version:
+        return False
+    db.session.info[REPLICA] = replica
+    return True
+
+def read_only(view):
+    """Views that only read, their queries may be served by the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_replica(current_app.extensions['sqlalchemy'].db)
+        return view(*args, **kwargs)
+    return wrapper
+
+def sync_replica(app):
+    """Copy the primary SQLite file into the replica file with the backup API."""
+    source = sqlite3.connect(sqlite_path(app.config['SQLALCHEMY_DATABASE_URI']))
+    target = sqlite3.connect(sqlite_path(app.config['SQLALCHEMY_BINDS'][REPLICA]))
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def is_conflict(error):
+    """Errors another attempt can get past: a unique key taken by a concurrent
+    writer, a busy SQLite database, a serialization failure or deadlock."""
+    if isinstance(error, sqla.exc.IntegrityError):
+        return True
+    if isinstance(error, sqla.exc.OperationalError):
+        message = str(error.orig).lower()
+        return 'locked' in message or 'busy' in message or getattr(error.orig, 'pgcode', None) in CONFLICT_PGCODES
+    return False
+
+def retry_on_conflict(view):
+    """Roll back and run the view again when its transaction hits a conflict."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        attempts = current_app.config['WRITE_RETRIES'] + 1
+        for attempt in range(attempts):
+            try:
+                return view(*args, **kwargs)
+            except sqla.exc.DBAPIError as error:
+                current_app.extensions['sqlalchemy'].db.session.rollback()
+                if attempt + 1 == attempts or not is_conflict(error):
+                    raise
+                with retries_lock:
+                    retries[request.endpoint] = retries.get(request.endpoint, 0) + 1
+                time.sleep(current_app.config['WRITE_RETRY_DELAY'] * 2 ** attempt * random.random())
+    return wrapper
+
+def retry_stats():
+    with retries_lock:
+        return dict(retries)
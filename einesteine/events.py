@@ -0,0 +1,155 @@
+import json
+import queue
+import threading
+import time
+from sqlalchemy import event
+
+
+
+class Subscription(object):
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        if self.overflowed:
+            self.overflowed = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return ('resync', {})
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MemoryBackend(object):
+    """Fan-out inside one process, every worker process has its own."""
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def __len__(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class NullBackend(object):
+    def __init__(self, queue_size=0):
+        pass
+
+    def subscribe(self, user_id):
+        return Subscription(1)
+
+    def unsubscribe(self, user_id, subscription):
+        pass
+
+    def publish(self, user_id, message):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+BACKENDS = {'memory' : MemoryBackend, 'null' : NullBackend}
+
+
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, ensure_ascii=False, separators=(",", ":"))}\n\n'
+
+
+class EventBroker(object):
+    """Per-user change feed behind /events.
+
+    Write paths call publish() next to their data changes; the events are
+    held on the database session and only reach subscribers once that
+    session commits, a rollback drops them.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.backend = NullBackend()
+        self.session = None
+        self.keepalive = 15
+        self.max_age = 300
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        backend = app.config.get('EVENTS_BACKEND', 'memory')
+        if isinstance(backend, str):
+            backend = BACKENDS[backend]
+        self.backend = backend(queue_size=app.config.get('EVENTS_QUEUE_SIZE', 256))
+        self.keepalive = app.config.get('EVENTS_KEEPALIVE', 15)
+        self.max_age = app.config.get('EVENTS_MAX_AGE', 300)
+        app.extensions['events'] = self
+        if db is not None:
+            self.session = db.session
+            if not event.contains(db.session, 'after_commit', self.after_commit):
+                event.listen(db.session, 'after_commit', self.after_commit)
+                event.listen(db.session, 'after_soft_rollback', self.after_soft_rollback)
+                event.listen(db.session, 'after_transaction_create', self.after_transaction_create)
+
+    def publish(self, user, name, data):
+        if self.session is None:
+            self.backend.publish(user.id, (name, data))
+        else:
+            self.session.info.setdefault('pending_events', []).append((user.id, (name, data)))
+
+    def after_commit(self, session):
+        session.info.pop('event_savepoints', None)
+        for user_id, message in session.info.pop('pending_events', ()):
+            self.backend.publish(user_id, message)
+
+    def after_transaction_create(self, session, transaction):
+        if transaction.nested:
+            session.info.setdefault('event_savepoints', {})[transaction] = len(session.info.get('pending_events', ()))
+
+    def after_soft_rollback(self, session, previous_transaction):
+        # a rolled back savepoint only takes back the events published inside it
+        savepoints = session.info.get('event_savepoints', {})
+        if previous_transaction.nested and previous_transaction in savepoints:
+            del session.info.get('pending_events', [])[savepoints.pop(previous_transaction):]
+        else:
+            session.info.pop('event_savepoints', None)
+            session.info.pop('pending_events', None)
+
+    def stream(self, user_id):
+        subscription = self.backend.subscribe(user_id)
+        deadline = time.monotonic() + self.max_age
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                message = subscription.get(self.keepalive)
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_event(*message)
+        finally:
+            self.backend.unsubscribe(user_id, subscription)
@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent import futures
+from contextlib import contextmanager
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher(object):
+    """Password hashing off the request threads.
+
+    PBKDF2 runs in a bounded process pool so a burst of logins cannot take
+    every worker thread; PASSWORD_HASH_WORKERS = 0 hashes inline. Callers
+    take a slot() per client address, at most PASSWORD_HASH_PER_CLIENT
+    hashes run concurrently for one address and at most
+    PASSWORD_HASH_MAX_PENDING overall, beyond that HashingBusy is raised.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256:260000'
+        self.salt_length = 16
+        self.workers = 0
+        self.timeout = None
+        self.per_client = 0
+        self.max_pending = 0
+        self.pending = 0
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.executor_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        if self.method.startswith('pbkdf2:') and self.method.count(':') == 1:
+            self.method += f':{DEFAULT_PBKDF2_ITERATIONS}'
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', self.salt_length)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT')
+        self.per_client = app.config.get('PASSWORD_HASH_PER_CLIENT', 0)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 0)
+        app.extensions['password_hasher'] = self
+
+    def get_executor(self):
+        # Pools do not survive a fork, every worker process gets its own.
+        # Its processes come from a forkserver, forking a threaded worker
+        # can leave the child waiting on a lock another thread held.
+        with self.lock:
+            if self.executor is None or self.executor_pid != os.getpid():
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('forkserver'))
+                self.executor_pid = os.getpid()
+            return self.executor
+
+    def run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        future = self.get_executor().submit(function, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise HashingBusy('Password hashing timed out')
+
+    @contextmanager
+    def slot(self, client):
+        with self.lock:
+            if self.max_pending and self.pending >= self.max_pending:
+                raise HashingBusy('Too many password checks in progress')
+            if self.per_client and self.clients.get(client, 0) >= self.per_client:
+                raise HashingBusy('Too many password checks from this address')
+            self.pending += 1
+            self.clients[client] = self.clients.get(client, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.clients[client] -= 1
+                if not self.clients[client]:
+                    del self.clients[client]
+
+    def hash(self, password):
+        return self.run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self.run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from einesteine import db, search, transfer
+from einesteine.models import User, Tag, Idea, Post, Job, tag_connections, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED
+
+
+
+HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    """The job is no longer running on this worker, stop it."""
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+def enqueue(kind, user=None, **payload):
+    """Add a job to the session, it is picked up once the caller commits."""
+    if kind not in HANDLERS:
+        raise KeyError(f'No job handler for {kind!r}')
+    job = Job(kind=kind, user_id=user.id if user is not None else None, payload=json.dumps(payload),
+              state=JOB_QUEUED, created_time=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+def describe(job):
+    return {'id' : job.id,
+            'kind' : job.kind,
+            'state' : job.state,
+            'progress' : job.progress,
+            'result' : json.loads(job.result) if job.result else None,
+            'error' : job.error,
+            'created_time' : job.created_time.strftime('%d.%m.%Y %H:%M') if job.created_time else None,
+            'finished_time' : job.finished_time.strftime('%d.%m.%Y %H:%M') if job.finished_time else None}
+
+
+def requeue_stale():
+    """Give jobs of a worker that died mid-run back to the queue."""
+    config = current_app.config
+    stale = datetime.utcnow() - timedelta(seconds=config['JOBS_TIMEOUT'])
+    running = Job.query.filter(Job.state == JOB_RUNNING, db.func.coalesce(Job.heartbeat_time, Job.started_time) < stale)
+    running.filter(Job.attempts >= config['JOBS_MAX_ATTEMPTS']) \
+           .update({Job.state : JOB_FAILED, Job.error : 'Timed out', Job.finished_time : datetime.utcnow()},
+                   synchronize_session=False)
+    running.update({Job.state : JOB_QUEUED}, synchronize_session=False)
+    db.session.commit()
+
+def claim():
+    while True:
+        job_id = db.session.query(Job.id).filter(Job.state == JOB_QUEUED).order_by(Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        claimed = Job.query.filter(Job.id == job_id, Job.state == JOB_QUEUED) \
+                           .update({Job.state : JOB_RUNNING, Job.started_time : datetime.utcnow(),
+                                    Job.heartbeat_time : datetime.utcnow(), Job.attempts : Job.attempts + 1},
+                                   synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return Job.query.get(job_id)
+
+def run(job):
+    job_id = job.id
+    try:
+        result = HANDLERS[job.kind](job, json.loads(job.payload or '{}'))
+    except JobCancelled:
+        db.session.rollback()
+        current_app.logger.info('Job %s (%s) cancelled', job_id, job.kind)
+        return
+    except Exception as error:
+        db.session.rollback()
+        current_app.logger.error('Job %s (%s) failed\n%s', job_id, job.kind, traceback.format_exc())
+        result = None
+        values = {Job.state : JOB_FAILED, Job.error : str(error)[:1000]}
+    else:
+        values = {Job.state : JOB_DONE, Job.result : json.dumps(result or {})}
+    values[Job.finished_time] = datetime.utcnow()
+    # the job may have been cancelled or requeued meanwhile, only a running job is finished
+    finished = Job.query.filter(Job.id == job_id, Job.state == JOB_RUNNING).update(values, synchronize_session=False)
+    db.session.commit()
+    if not finished and result and 'file' in result:
+        remove_file(result['file'])
+
+def run_next():
+    job = claim()
+    if job is None:
+        return False
+    run(job)
+    return True
+
+def work(once=False, stop=None):
+    """Process jobs until stop is set; with once, until the queue is empty.
+
+    An iteration that fails, on a locked database say, is logged and tried
+    again after JOBS_POLL_INTERVAL, the worker itself never stops.
+    """
+    idle = True
+    while stop is None or not stop.is_set():
+        try:
+            if idle:
+                requeue_stale()
+            idle = not run_next()
+            if idle and once:
+                return
+        except Exception:
+            current_app.logger.error('Job worker iteration failed\n%s', traceback.format_exc())
+            idle = True
+        if idle:
+            db.session.remove()
+            time.sleep(current_app.config['JOBS_POLL_INTERVAL'])
+
+def start_threads(app, count):
+    stop = threading.Event()
+
+    def target():
+        with app.app_context():
+            work(stop=stop)
+
+    for number in range(count):
+        threading.Thread(target=target, name=f'jobs-{number}', daemon=True).start()
+    return stop
+
+
+def report_progress(job, count):
+    job.progress += count
+    job.heartbeat_time = datetime.utcnow()
+    db.session.commit()
+
+def heartbeat(job):
+    """Tell requeue_stale the job is alive without committing the session,
+    for handlers that hold a cursor open across chunks. Raises JobCancelled
+    once the job was cancelled or handed to another worker."""
+    with db.engine.begin() as connection:
+        beating = connection.execute(Job.__table__.update().where(Job.id == job.id, Job.state == JOB_RUNNING)
+                                                           .values(heartbeat_time=datetime.utcnow())).rowcount
+    if not beating:
+        raise JobCancelled(job.id)
+
+def delete_chunks(job, ids_query, deletes):
+    chunk = current_app.config['JOBS_CHUNK_SIZE']
+    while True:
+        ids = [row_id for row_id, in ids_query.limit(chunk)]
+        if not ids:
+            return
+        for table, column in deletes:
+            db.session.execute(table.delete().where(column.in_(ids)))
+        report_progress(job, len(ids))
+
+@handler('delete_account')
+def delete_account(job, payload):
+    """Remove an account in short transactions so other writers are never blocked for long."""
+    user_id = payload['user_id']
+    delete_chunks(job, db.session.query(Idea.id).filter(Idea.user_id == user_id),
+                  ((tag_connections, tag_connections.c.tagged_id), (Post.__table__, Post.idea_id), (Idea.__table__, Idea.id)))
+    delete_chunks(job, db.session.query(Post.id).filter(Post.user_id == user_id),
+                  ((Post.__table__, Post.id),))
+    delete_chunks(job, db.session.query(Tag.id).filter(Tag.user_id == user_id),
+                  ((tag_connections, tag_connections.c.tag_id), (Tag.__table__, Tag.id)))
+    other_jobs = Job.query.filter(Job.user_id == user_id, Job.id != job.id)
+    for other in other_jobs.filter(Job.kind == 'export', Job.state == JOB_DONE):
+        remove_export(other)
+    # running jobs stop at their next heartbeat and clean up after themselves
+    other_jobs.filter(Job.state == JOB_RUNNING) \
+              .update({Job.state : JOB_CANCELLED, Job.user_id : None, Job.finished_time : datetime.utcnow()},
+                      synchronize_session=False)
+    other_jobs.delete(synchronize_session=False)
+    job.user_id = None
+    db.session.flush()
+    User.query.filter(User.id == user_id).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted' : job.progress}
+
+@handler('export')
+def export(job, payload):
+    user = User.query.get(payload['user_id'])
+    directory = current_app.config['JOBS_EXPORT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    filename = f'export-{job.id}.jsonl'
+    lines = 0
+    chunk = current_app.config['JOBS_CHUNK_SIZE']
+    try:
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as file:
+            for line in transfer.export_lines(user):
+                file.write(line)
+                lines += 1
+                if not lines % chunk:
+                    heartbeat(job)
+    except JobCancelled:
+        remove_file(filename)
+        raise
+    job.progress = lines
+    return {'file' : filename, 'lines' : lines}
+
+def export_path(job):
+    result = json.loads(job.result) if job.result else {}
+    if 'file' not in result:
+        return None
+    return os.path.join(current_app.config['JOBS_EXPORT_DIR'], result['file'])
+
+def remove_file(filename):
+    path = os.path.join(current_app.config['JOBS_EXPORT_DIR'], filename)
+    if os.path.exists(path):
+        os.remove(path)
+
+def remove_export(job):
+    path = export_path(job)
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+@handler('rebuild_index')
+def rebuild_index(job, payload):
+    if not search.is_supported():
+        raise RuntimeError('Full-text search requires an SQLite database.')
+    search.rebuild_index()
+    return {}
@@ -1,16 +1,28 @@
-from einesteine import db, login
-from werkzeug.security import generate_password_hash, check_password_hash
+from einesteine import db, login, hasher
 from flask_login import UserMixin
+from datetime import datetime
 
 
 
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    user = User.query.get(int(id))
+    return user if user is not None and user.active else None
+
+STAGE_NEW = 1
+STAGE_IN_PROGRESS = 2
+STAGE_COMPLETE = 3
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
 
 tag_connections = db.Table('tag_connections',
-                  db.Column('tagged_id', db.Integer, db.ForeignKey('idea.id')),
-                  db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'))
+                  db.Column('tagged_id', db.Integer, db.ForeignKey('idea.id'), index=True),
+                  db.Column('tag_id', db.Integer, db.ForeignKey('tag.id')),
+                  db.Index('uq_tag_connections_tag_id_tagged_id', 'tag_id', 'tagged_id', unique=True)
                   )
 
 class User(db.Model, UserMixin):
@@ -20,16 +32,48 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(128))
     register_time = db.Column(db.DateTime)
     last_idea_id = db.Column(db.Integer, default=1)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_modified = db.Column(db.DateTime)
+    active = db.Column(db.Boolean(), nullable=False, default=True, server_default=db.true())
     ideas = db.relationship('Idea', backref='idea_author', lazy='dynamic')
     posts = db.relationship('Post', backref='post_author', lazy='dynamic')
     tags = db.relationship('Tag', backref='tag_author', lazy='dynamic')
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not hasher.verify(self.password_hash, password):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
+    @property
+    def is_active(self):
+        return self.active
+    def deactivate(self):
+        self.active = False
+        self.username = f'deleted-{self.id}'
+        self.email = None
+        self.password_hash = None
+    def bump_data_version(self):
+        bump_data_version(self.id)
     def __repr__(self):
         return f'<User {self.username}>'
 
+def reserve_numbers(user_id, count):
+    """Take count idea numbers of a user, returns the first one.
+
+    The increment happens in the database, the UPDATE holds the row until
+    commit so concurrent callers always get disjoint ranges.
+    """
+    User.query.filter(User.id == user_id) \
+              .update({User.last_idea_id : db.func.coalesce(User.last_idea_id, 1) + count}, synchronize_session=False)
+    next_number = db.session.query(User.last_idea_id).filter(User.id == user_id).scalar()
+    return next_number - count
+
+def bump_data_version(user_id):
+    User.query.filter_by(id=user_id).update({User.data_version : User.data_version + 1,
+                                             User.data_modified : datetime.utcnow().replace(microsecond=0)})
+
 class Idea(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(140))
@@ -37,9 +81,46 @@ class Idea(db.Model):
     complete = db.Column(db.Boolean(), default=False)
     created_time = db.Column(db.DateTime)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_time = db.Column(db.DateTime)
+    stage = db.Column(db.Integer, nullable=False, default=STAGE_NEW, server_default=str(STAGE_NEW))
     posts = db.relationship('Post', backref='idea_post', lazy='dynamic')
+    __table_args__ = (db.Index('ix_idea_user_id_created_time', 'user_id', 'created_time', 'id'),
+                      db.Index('ix_idea_user_id_stage', 'user_id', 'stage'),
+                      db.Index('uq_idea_user_id_number', 'user_id', 'number', unique=True))
     def length(self):
         return len(self.posts)
+    def refresh_stage(self):
+        if self.complete:
+            self.stage = STAGE_COMPLETE
+        elif self.post_count:
+            self.stage = STAGE_IN_PROGRESS
+        else:
+            self.stage = STAGE_NEW
+    def set_complete(self, complete):
+        self.complete = complete
+        self.refresh_stage()
+    def post_added(self, post):
+        self.post_count = (self.post_count or 0) + 1
+        if self.last_post_time is None or post.created_time > self.last_post_time:
+            self.last_post_time = post.created_time
+        self.refresh_stage()
+    def post_removed(self, post):
+        self.post_count = max((self.post_count or 0) - 1, 0)
+        self.last_post_time = db.session.query(db.func.max(Post.created_time)) \
+                                        .filter(Post.idea_id == self.id, Post.id != post.id) \
+                                        .scalar()
+        self.refresh_stage()
+    def connect_tag(self, tag):
+        self.tags.append(tag)
+        tag.idea_count = (tag.idea_count or 0) + 1
+    def disconnect_tag(self, tag):
+        self.tags.remove(tag)
+        tag.idea_count = max((tag.idea_count or 0) - 1, 0)
+    def release_tags(self):
+        Tag.query.filter(Tag.id.in_(db.session.query(tag_connections.c.tag_id)
+                                              .filter(tag_connections.c.tagged_id == self.id))) \
+                 .update({Tag.idea_count : Tag.idea_count - 1}, synchronize_session=False)
     def __repr__(self):
         return f'<Idea {self.name}>'
 
@@ -49,6 +130,7 @@ class Post(db.Model):
     created_time = db.Column(db.DateTime)
     idea_id = db.Column(db.Integer, db.ForeignKey('idea.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    __table_args__ = (db.Index('ix_post_idea_id_created_time', 'idea_id', 'created_time', 'id'),)
     def __repr__(self):
         return f'<Post {self.body}>'
 
@@ -57,9 +139,44 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(25))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    idea_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    __table_args__ = (db.Index('uq_tag_user_id_name', 'user_id', 'name', unique=True),)
     ideas = db.relationship('Idea', secondary = tag_connections,
                             secondaryjoin = (tag_connections.c.tagged_id == Idea.id),
                             primaryjoin = (tag_connections.c.tag_id == id),
                             backref=db.backref('tags', lazy='dynamic'), lazy='dynamic')
     def __repr__(self):
         return f'<Tag {self.name}>'
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    payload = db.Column(db.Text)
+    state = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    progress = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_time = db.Column(db.DateTime)
+    started_time = db.Column(db.DateTime)
+    heartbeat_time = db.Column(db.DateTime)
+    finished_time = db.Column(db.DateTime)
+    __table_args__ = (db.Index('ix_job_state_id', 'state', 'id'),)
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.state}>'
+
+
+def refresh_counters(user_id):
+    post_count = db.select(db.func.count(Post.id)).where(Post.idea_id == Idea.id).scalar_subquery()
+    last_post_time = db.select(db.func.max(Post.created_time)).where(Post.idea_id == Idea.id).scalar_subquery()
+    Idea.query.filter(Idea.user_id == user_id) \
+              .update({Idea.post_count : post_count, Idea.last_post_time : last_post_time}, synchronize_session=False)
+    Idea.query.filter(Idea.user_id == user_id) \
+              .update({Idea.stage : db.case((Idea.complete == True, STAGE_COMPLETE),
+                                            (Idea.post_count > 0, STAGE_IN_PROGRESS),
+                                            else_=STAGE_NEW)}, synchronize_session=False)
+    idea_count = db.select(db.func.count()).select_from(tag_connections) \
+                   .join(Idea, Idea.id == tag_connections.c.tagged_id) \
+                   .where(tag_connections.c.tag_id == Tag.id).scalar_subquery()
+    Tag.query.filter(Tag.user_id == user_id).update({Tag.idea_count : idea_count}, synchronize_session=False)
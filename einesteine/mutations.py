@@ -0,0 +1,176 @@
+from einesteine import db, broker
+from datetime import datetime
+from einesteine.models import Tag, Idea, Post
+
+
+
+class MutationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise MutationError('Invalid id')
+
+def to_text(value):
+    if not isinstance(value, str):
+        raise MutationError('Invalid text')
+    return value
+
+def owned_idea(user, idea_id):
+    idea = Idea.query.get(to_id(idea_id))
+    if idea is None or idea.user_id != user.id:
+        raise MutationError('Idea not found', 404)
+    return idea
+
+def owned_tag(user, tag_id):
+    tag = Tag.query.get(to_id(tag_id))
+    if tag is None or tag.user_id != user.id:
+        raise MutationError('Tag not found', 404)
+    return tag
+
+def rename_idea(user, data):
+    idea = owned_idea(user, data['idea_id'])
+    name = to_text(data['name'])[:140]
+    if idea.name != name:
+        idea.name = name
+        broker.publish(user, 'idea.renamed', {'id' : idea.id, 'name' : name})
+    return {}
+
+def add_post(user, data):
+    idea = owned_idea(user, data['idea_id'])
+    if to_text(data['text']) == '':
+        return {'post_id' : False, 'created_time' : False}
+    try:
+        created_time = datetime.strptime(data['date'], '%d.%m.%Y %H:%M')
+    except (TypeError, ValueError):
+        raise MutationError('Invalid date')
+    post = Post(body = data['text'][:3000], created_time = created_time, user_id=user.id, idea_id=idea.id)
+    db.session.add(post)
+    idea.post_added(post)
+    db.session.flush()
+    created_time = post.created_time.strftime('%d.%m.%Y %H:%M')
+    broker.publish(user, 'post.added', {'idea_id' : idea.id, 'id' : post.id, 'body' : post.body,
+                                        'created_time' : created_time, 'post_count' : idea.post_count})
+    return {'post_id' : post.id, 'created_time' : created_time}
+
+def set_complete(user, data):
+    idea = owned_idea(user, data['idea_id'])
+    if data['completed'] not in [True, False]:
+        raise MutationError('Invalid completed flag')
+    if bool(idea.complete) != data['completed']:
+        idea.set_complete(data['completed'])
+        broker.publish(user, 'idea.completed', {'id' : idea.id, 'complete' : data['completed'], 'stage' : idea.stage})
+    return {}
+
+def connect_tag(user, data):
+    idea = owned_idea(user, data['idea_id'])
+    tag = owned_tag(user, data['tag_id'])
+    connected = False
+    if tag not in idea.tags:
+        idea.connect_tag(tag)
+        connected = True
+        broker.publish(user, 'tag.connected', {'idea_id' : idea.id, 'tag_id' : tag.id, 'name' : tag.name})
+    return {'tag_name' : tag.name, 'connected' : connected}
+
+def disconnect_tag(user, data):
+    idea = owned_idea(user, data['idea_id'])
+    tag = owned_tag(user, data['tag_id'])
+    disconnected = False
+    if tag in idea.tags:
+        idea.disconnect_tag(tag)
+        disconnected = True
+        broker.publish(user, 'tag.disconnected', {'idea_id' : idea.id, 'tag_id' : tag.id})
+    return {'disconnected' : disconnected}
+
+def delete_post(user, data):
+    post = Post.query.get(to_id(data['post_id']))
+    if post is None or post.user_id != user.id:
+        raise MutationError('Post not found', 404)
+    if post.idea_post is not None:
+        post.idea_post.post_removed(post)
+        broker.publish(user, 'post.deleted', {'idea_id' : post.idea_id, 'id' : post.id, 'post_count' : post.idea_post.post_count})
+    db.session.delete(post)
+    return {}
+
+OPERATIONS = {'rename' : rename_idea,
+              'add_post' : add_post,
+              'complete' : set_complete,
+              'connect' : connect_tag,
+              'disconnect' : disconnect_tag,
+              'delete_post' : delete_post}
+
+FIELDS = {'rename' : {'idea_id' : to_id, 'name' : to_text},
+          'add_post' : {'idea_id' : to_id, 'text' : to_text},
+          'complete' : {'idea_id' : to_id},
+          'connect' : {'idea_id' : to_id, 'tag_id' : to_id},
+          'disconnect' : {'idea_id' : to_id, 'tag_id' : to_id},
+          'delete_post' : {'post_id' : to_id}}
+
+
+def apply(user, operation, data):
+    try:
+        return OPERATIONS[operation](user, data)
+    except KeyError as error:
+        raise MutationError(f'Missing field {error}')
+
+def validate(data):
+    """Check the shape of an operation without touching the database."""
+    if not isinstance(data, dict) or data.get('op') not in OPERATIONS:
+        raise MutationError('Unknown operation')
+    try:
+        for field, check in FIELDS[data['op']].items():
+            check(data[field])
+    except KeyError as error:
+        raise MutationError(f'Missing field {error}')
+    return data
+
+def validate_batch(operations):
+    """Operations that failed validate() are replaced by their MutationError."""
+    checked = []
+    for data in operations:
+        try:
+            checked.append(validate(data))
+        except MutationError as error:
+            checked.append(error)
+    return checked
+
+def apply_batch(user, operations):
+    """Apply validate_batch() output, the caller bumps the data version."""
+    results = []
+    for data in operations:
+        try:
+            if isinstance(data, MutationError):
+                raise data
+            result = apply(user, data['op'], data)
+            result['status'] = 200
+        except MutationError as error:
+            result = {'status' : error.status, 'error' : str(error)}
+        results.append(result)
+    return results
+
+def apply_updates(user, updates):
+    """Saves of one idea merged into one write.
+
+    Every update adds its own post, the name and completed flag are only
+    written once, from the last update that went through.
+    """
+    results = []
+    last = None
+    for data in updates:
+        try:
+            if 'name' not in data or 'completed' not in data:
+                raise MutationError('Missing field')
+            results.append(apply(user, 'add_post', data))
+            last = data
+        except MutationError as error:
+            results.append(error)
+    if last is not None:
+        rename_idea(user, last)
+        if last['completed'] in [True, False]:
+            set_complete(user, last)
+    return results
@@ -0,0 +1,185 @@
+import bisect
+import cProfile
+import heapq
+import os
+import threading
+import time
+from flask import current_app, g, has_app_context, request, Response
+from sqlalchemy import event
+from einesteine.database import retry_stats
+
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class RequestProfile(object):
+    def __init__(self, keep):
+        self.start = time.perf_counter()
+        self.keep = keep
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest = []
+        self.profile = None
+
+    def record(self, statement, elapsed):
+        self.queries += 1
+        self.sql_time += elapsed
+        item = (elapsed, self.queries, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+    def slowest_statements(self):
+        return [(elapsed, statement) for elapsed, number, statement in sorted(self.slowest, reverse=True)]
+
+
+class Profiler(object):
+    """Opt-in request profiling.
+
+    Times every request and every SQL statement it runs, reports both in a
+    Server-Timing header, keeps per-endpoint histograms for /metrics and
+    dumps a cProfile of requests slower than PROFILING_SLOW_REQUEST.
+    """
+
+    METRICS = (('einesteine_request_duration_seconds', 'Request wall time in seconds.', 'duration'),
+               ('einesteine_request_sql_queries', 'SQL statements executed per request.', 'queries'),
+               ('einesteine_request_sql_seconds', 'Time spent in SQL per request in seconds.', 'sql_time'))
+
+    def __init__(self, app=None, db=None):
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.enabled = False
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        if not app.config.get('PROFILING_ENABLED'):
+            return
+        self.enabled = True
+        self.config = app.config
+        self.keep = app.config.get('PROFILING_SLOWEST_STATEMENTS', 5)
+        self.cache = app.extensions.get('response_cache')
+        self.limiter = app.extensions.get('rate_limiter')
+        self.coalescer = app.extensions.get('coalescer')
+        app.extensions['profiler'] = self
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics)
+        if db is not None:
+            # the replica bind serves read_only views, its queries count too
+            with app.app_context():
+                engines = [db.engine] + [db.get_engine(app, bind) for bind in app.config.get('SQLALCHEMY_BINDS') or {}]
+                for engine in engines:
+                    event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        profile = g.get('request_profile') if has_app_context() else None
+        if profile is not None:
+            profile.record(statement, elapsed)
+
+    def start_request(self):
+        g.request_profile = RequestProfile(self.keep)
+        if self.config.get('PROFILING_CPROFILE'):
+            g.request_profile.profile = cProfile.Profile()
+            g.request_profile.profile.enable()
+
+    def finish_request(self, response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        duration = time.perf_counter() - profile.start
+        if profile.profile is not None:
+            profile.profile.disable()
+        endpoint = request.endpoint or 'unknown'
+        self.observe(endpoint, duration, profile)
+        response.headers['Server-Timing'] = f'app;dur={duration * 1000:.1f}, ' \
+                                            f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.queries} queries"'
+        if duration >= self.config.get('PROFILING_SLOW_REQUEST', 0.5):
+            self.report_slow(endpoint, duration, profile)
+        elif profile.queries >= self.config.get('PROFILING_QUERY_WARNING', 25):
+            self.report_queries(endpoint, profile)
+        return response
+
+    def observe(self, endpoint, duration, profile):
+        values = {'duration' : duration, 'queries' : profile.queries, 'sql_time' : profile.sql_time}
+        with self.lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = {'duration' : Histogram(DEFAULT_BUCKETS),
+                                             'queries' : Histogram(QUERY_BUCKETS),
+                                             'sql_time' : Histogram(DEFAULT_BUCKETS)}
+            for key, value in values.items():
+                self.histograms[endpoint][key].observe(value)
+
+    def report_queries(self, endpoint, profile):
+        current_app.logger.warning('%s ran %d SQL statements in %.1f ms', endpoint, profile.queries, profile.sql_time * 1000)
+
+    def report_slow(self, endpoint, duration, profile):
+        slowest = '\n'.join(f'  {elapsed * 1000:.1f} ms: {statement}' for elapsed, statement in profile.slowest_statements())
+        current_app.logger.warning('Slow request %s took %.1f ms, %d SQL statements in %.1f ms\n%s',
+                                   endpoint, duration * 1000, profile.queries, profile.sql_time * 1000, slowest)
+        if profile.profile is not None:
+            directory = self.config.get('PROFILING_DUMP_DIR') or 'profiles'
+            os.makedirs(directory, exist_ok=True)
+            filename = f'{endpoint}-{int(time.time() * 1000)}-{int(duration * 1000)}ms.prof'
+            profile.profile.dump_stats(os.path.join(directory, filename))
+
+    def metrics(self):
+        lines = []
+        with self.lock:
+            for name, description, key in self.METRICS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, histograms in sorted(self.histograms.items()):
+                    lines.extend(histograms[key].render(name, f'endpoint="{endpoint}"'))
+        if self.cache is not None:
+            stats = self.cache.stats()
+            for key in ('hits', 'misses'):
+                lines.append(f'# TYPE einesteine_cache_{key}_total counter')
+                lines.append(f'einesteine_cache_{key}_total {stats[key]}')
+        if self.limiter is not None:
+            stats = self.limiter.stats()
+            for key in ('allowed', 'rejected'):
+                lines.append(f'# TYPE einesteine_rate_limit_{key}_total counter')
+                for endpoint, count in sorted(stats[key].items()):
+                    lines.append(f'einesteine_rate_limit_{key}_total{{endpoint="{endpoint}"}} {count}')
+        if self.coalescer is not None:
+            stats = self.coalescer.stats()
+            for key in ('requests', 'writes'):
+                lines.append(f'# TYPE einesteine_coalesced_{key}_total counter')
+                lines.append(f'einesteine_coalesced_{key}_total {stats[key]}')
+        lines.append('# TYPE einesteine_write_retries_total counter')
+        for endpoint, count in sorted(retry_stats().items()):
+            lines.append(f'einesteine_write_retries_total{{endpoint="{endpoint}"}} {count}')
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,144 @@
+from einesteine import db
+import sqlalchemy as sqla
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from einesteine.models import Tag, Idea, Post, tag_connections, STAGE_NEW, STAGE_IN_PROGRESS, STAGE_COMPLETE
+
+
+
+IDEAS_PER_PAGE = 50
+POSTS_PER_PAGE = 30
+MAX_FILTER_TAGS = 20
+STAGES = {'1' : STAGE_NEW, '2' : STAGE_IN_PROGRESS, '3' : STAGE_COMPLETE}
+
+IdeaCard = namedtuple('IdeaCard', ['idea', 'posts_count', 'tags'])
+IdeaRow = namedtuple('IdeaRow', ['id', 'number', 'name', 'complete', 'created_time'])
+TagRef = namedtuple('TagRef', ['id', 'name'])
+SidebarTag = namedtuple('SidebarTag', ['id', 'name', 'ideas_count'])
+PostRow = namedtuple('PostRow', ['id', 'body', 'created_time'])
+TagFilter = namedtuple('TagFilter', ['all', 'any', 'none'])
+TagStats = namedtuple('TagStats', ['id', 'name', 'ideas_count', 'new', 'in_progress', 'complete', 'last_activity'])
+
+
+NO_TAG_FILTER = TagFilter((), (), ())
+
+
+def split_names(value):
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip()[:25]
+        if name and name not in names:
+            names.append(name)
+    return tuple(names[:MAX_FILTER_TAGS])
+
+def parse_tag_filter(args):
+    """Tag names from the all (AND), any (OR) and none (NOT) comma separated arguments."""
+    return TagFilter(split_names(args.get('all')), split_names(args.get('any')), split_names(args.get('none')))
+
+def tag_filter_args(tags):
+    return {key : ','.join(names) for key, names in tags._asdict().items() if names}
+
+def tagged_ideas(user, names):
+    return db.session.query(tag_connections.c.tagged_id) \
+                     .join(Tag, Tag.id == tag_connections.c.tag_id) \
+                     .filter(Tag.user_id == user.id, Tag.name.in_(names))
+
+def filter_ideas(user, tag_name='none', stage='none', tags=NO_TAG_FILTER):
+    ideas = Idea.query.filter(Idea.user_id == user.id)
+    if tag_name != 'none' and tag_name not in tags.all:
+        tags = tags._replace(all=(tag_name,) + tags.all)
+    if tags.all or tags.any:
+        having = []
+        if tags.all:
+            matched = sqla.func.count(sqla.distinct(sqla.case((Tag.name.in_(tags.all), Tag.name))))
+            having.append(matched == len(tags.all))
+        if tags.any:
+            having.append(sqla.func.max(sqla.case((Tag.name.in_(tags.any), 1), else_=0)) == 1)
+        matching = tagged_ideas(user, tags.all + tags.any) \
+                       .group_by(tag_connections.c.tagged_id) \
+                       .having(sqla.and_(*having))
+        ideas = ideas.filter(Idea.id.in_(matching))
+    if tags.none:
+        ideas = ideas.filter(~Idea.id.in_(tagged_ideas(user, tags.none)))
+    if stage in STAGES:
+        ideas = ideas.filter(Idea.stage == STAGES[stage])
+    return ideas
+
+def tags_by_idea(idea_ids):
+    tags = {idea_id : [] for idea_id in idea_ids}
+    if not idea_ids:
+        return tags
+    rows = db.session.query(tag_connections.c.tagged_id, Tag.id, Tag.name) \
+                     .join(Tag, Tag.id == tag_connections.c.tag_id) \
+                     .filter(tag_connections.c.tagged_id.in_(idea_ids)) \
+                     .order_by(Tag.id)
+    for idea_id, tag_id, tag_name in rows:
+        tags[idea_id].append(TagRef(tag_id, tag_name))
+    return tags
+
+def encode_cursor(created_time, idea_id):
+    raw = json.dumps([created_time.isoformat(), idea_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_time, idea_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_time), int(idea_id)
+    except (AttributeError, TypeError, ValueError, UnicodeError):
+        raise ValueError(f'Invalid cursor {cursor!r}')
+
+def next_cursor(cards, per_page=IDEAS_PER_PAGE):
+    if len(cards) < per_page:
+        return None
+    last = cards[-1].idea
+    return encode_cursor(last.created_time, last.id)
+
+def ideas_page(user, tag_name='none', stage='none', page=1, per_page=IDEAS_PER_PAGE, cursor=None, tags=NO_TAG_FILTER):
+    ideas = filter_ideas(user, tag_name, stage, tags).order_by(Idea.created_time, Idea.id)
+    if cursor is not None:
+        ideas = ideas.filter(sqla.tuple_(Idea.created_time, Idea.id) > sqla.tuple_(*decode_cursor(cursor)))
+    else:
+        ideas = ideas.offset((page - 1) * per_page)
+    # plain rows instead of Idea objects, list pages never write them back
+    rows = ideas.with_entities(Idea.id, Idea.number, Idea.name, Idea.complete, Idea.created_time, Idea.post_count) \
+                .limit(per_page).all()
+    tags = tags_by_idea([row.id for row in rows])
+    return [IdeaCard(IdeaRow(*row[:-1]), row.post_count, tuple(tags[row.id])) for row in rows]
+
+def sidebar_tags(user):
+    rows = db.session.query(Tag.id, Tag.name, Tag.idea_count) \
+                     .filter(Tag.user_id == user.id) \
+                     .order_by(Tag.id)
+    return [SidebarTag(*row) for row in rows]
+
+def tag_stats(user):
+    """Ideas per tag split by stage and the latest post or idea time, in one grouped query."""
+    def in_stage(stage):
+        return sqla.func.coalesce(sqla.func.sum(sqla.case((Idea.stage == stage, 1), else_=0)), 0)
+    rows = db.session.query(Tag.id, Tag.name, sqla.func.count(Idea.id),
+                            in_stage(STAGE_NEW), in_stage(STAGE_IN_PROGRESS), in_stage(STAGE_COMPLETE),
+                            sqla.func.max(sqla.func.coalesce(Idea.last_post_time, Idea.created_time))) \
+                     .outerjoin(tag_connections, tag_connections.c.tag_id == Tag.id) \
+                     .outerjoin(Idea, Idea.id == tag_connections.c.tagged_id) \
+                     .filter(Tag.user_id == user.id) \
+                     .group_by(Tag.id, Tag.name) \
+                     .order_by(Tag.id)
+    return [TagStats(*row) for row in rows]
+
+def posts_page(idea_id, per_page=POSTS_PER_PAGE, cursor=None):
+    """Newest posts of an idea older than the cursor, in chronological order."""
+    posts = db.session.query(Post.id, Post.body, Post.created_time) \
+                      .filter(Post.idea_id == idea_id) \
+                      .order_by(Post.created_time.desc(), Post.id.desc())
+    if cursor is not None:
+        posts = posts.filter(sqla.tuple_(Post.created_time, Post.id) < sqla.tuple_(*decode_cursor(cursor)))
+    rows = [PostRow(*row) for row in posts.limit(per_page)]
+    rows.reverse()
+    return rows
+
+def older_posts_cursor(posts, per_page=POSTS_PER_PAGE):
+    if len(posts) < per_page:
+        return None
+    return encode_cursor(posts[0].created_time, posts[0].id)
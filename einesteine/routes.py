@@ -1,232 +1,490 @@
 # -*- coding: utf-8 -*-
 
-from einesteine import app, db
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from einesteine import db, cache, fragments, hasher, broker, limiter, coalescer
+from einesteine.hashing import HashingBusy
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context, send_file
 from flask_login import current_user, login_user, logout_user, login_required
 import sqlalchemy as sqla
 from werkzeug.urls import url_parse
+from markupsafe import Markup
 import einesteine.forms as forms
-from einesteine.models import User, Tag, Idea, Post, tag_connections
+import einesteine.queries as queries
+import einesteine.search as search
+import einesteine.mutations as mutations
+import einesteine.transfer as transfer
+import einesteine.wire as wire
+import einesteine.jobs as jobs
+from einesteine.database import read_only, retry_on_conflict, is_conflict
+from einesteine.models import User, Tag, Idea, Job, reserve_numbers, JOB_DONE
 from datetime import datetime
 
 
 
-@app.route('/logout')
+bp = Blueprint('main', __name__)
+
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/add_tag/<tag_name>', methods=['POST'])
+@bp.route('/add_tag/<tag_name>', methods=['POST'])
 @login_required
+@limiter.limit
+@retry_on_conflict
 def add_tag(tag_name):
+    tag = Tag.query.filter_by(user_id=current_user.id, name=tag_name[:25]).first()
+    if tag is not None:
+        return jsonify({'status' : '200', 'tag_name' : tag.name, 'tag_id' : tag.id, 'created' : False})
     tag = Tag(name=tag_name[:25], user_id=current_user.id)
     db.session.add(tag)
+    try:
+        db.session.flush()
+    except sqla.exc.IntegrityError:
+        # a concurrent request created the same tag first
+        db.session.rollback()
+        tag = Tag.query.filter_by(user_id=current_user.id, name=tag_name[:25]).one()
+        return jsonify({'status' : '200', 'tag_name' : tag.name, 'tag_id' : tag.id, 'created' : False})
+    broker.publish(current_user, 'tag.created', {'id' : tag.id, 'name' : tag.name})
+    current_user.bump_data_version()
     db.session.commit()
-    return jsonify({'status' : '200', 'tag_name' : tag_name, 'tag_id' : tag.id})
+    return jsonify({'status' : '200', 'tag_name' : tag.name, 'tag_id' : tag.id, 'created' : True})
 
-@app.route('/del_tag/<tag_id>', methods=['POST'])
+@bp.route('/del_tag/<tag_id>', methods=['POST'])
 @login_required
+@retry_on_conflict
 def del_tag(tag_id):
     tag = Tag.query.filter_by(id = tag_id, user_id = current_user.id).first()
     if tag:
+        broker.publish(current_user, 'tag.deleted', {'id' : tag.id})
         db.session.delete(tag)
+        current_user.bump_data_version()
         db.session.commit()
         return '200'
     else: return '500'
 
-@app.route('/connect/<idea_id>/<tag_id>', methods=['POST'])
+@bp.route('/connect/<idea_id>/<tag_id>', methods=['POST'])
 @login_required
+@retry_on_conflict
 def connect_idea_tag(idea_id, tag_id):
-    idea = Idea.query.get(idea_id)
-    tag = Tag.query.get(tag_id)
-    connected = False
-    if tag not in idea.tags:
-        idea.tags.append(tag)
-        db.session.commit()
-        connected = True
-    return jsonify({'status' : '200', 'tag_name' : tag.name, 'connected' : connected})
+    try:
+        result = mutations.connect_tag(current_user, {'idea_id' : idea_id, 'tag_id' : tag_id})
+    except mutations.MutationError as error:
+        return jsonify({'status' : str(error.status)}), error.status
+    if result['connected']:
+        current_user.bump_data_version()
+        try:
+            db.session.commit()
+        except sqla.exc.IntegrityError:
+            # a concurrent request connected the same tag first
+            db.session.rollback()
+            result['connected'] = False
+    return jsonify({'status' : '200', 'tag_name' : result['tag_name'], 'connected' : result['connected']})
 
-@app.route('/disconnect/<idea_id>/<tag_id>', methods=['POST'])
+@bp.route('/disconnect/<idea_id>/<tag_id>', methods=['POST'])
 @login_required
+@retry_on_conflict
 def disconnect_idea_tag(idea_id, tag_id):
-    idea = Idea.query.get(idea_id)
-    tag = Tag.query.get(tag_id)
-    if tag in idea.tags:
-        idea.tags.remove(tag)
+    try:
+        result = mutations.disconnect_tag(current_user, {'idea_id' : idea_id, 'tag_id' : tag_id})
+    except mutations.MutationError as error:
+        return jsonify({'status' : str(error.status)}), error.status
+    if result['disconnected']:
+        current_user.bump_data_version()
         db.session.commit()
     return jsonify({'status' : '200'})
 
-@app.route('/delete_post/<post_id>', methods=['POST'])
+@bp.route('/delete_post/<post_id>', methods=['POST'])
 @login_required
+@retry_on_conflict
 def delete_post(post_id):
-    post = Post.query.get(post_id)
-    if post is not None:
-        if post.user_id == current_user.id:
-            db.session.delete(post)
-            db.session.commit()
+    try:
+        mutations.delete_post(current_user, {'post_id' : post_id})
+    except mutations.MutationError:
+        return jsonify({'status' : '200'})
+    current_user.bump_data_version()
+    db.session.commit()
     return jsonify({'status' : '200'})
 
-@app.route('/delete_idea/<idea_id>', methods=['POST'])
+@bp.route('/delete_idea/<idea_id>', methods=['POST'])
 @login_required
+@retry_on_conflict
 def delete_idea(idea_id):
     idea = Idea.query.get(idea_id)
     if idea is not None:
         if idea.user_id == current_user.id:
+            idea.release_tags()
+            broker.publish(current_user, 'idea.deleted', {'id' : idea.id})
             db.session.delete(idea)
+            current_user.bump_data_version()
             db.session.commit()
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/update_idea', methods=['POST'])
+def save_updates(user, updates):
+    results = mutations.apply_updates(user, updates)
+    if all(isinstance(result, mutations.MutationError) for result in results):
+        db.session.rollback()
+    else:
+        user.bump_data_version()
+        db.session.commit()
+    return results
+
+def save_batches(user, batches):
+    """Every batch runs in its own savepoint, a batch that fails is rolled
+    back alone and answers None; only a conflict fails the whole group."""
+    # the UPDATE opens the transaction the savepoints nest in
+    user.bump_data_version()
+    results = []
+    for operations in batches:
+        try:
+            with db.session.begin_nested():
+                results.append(mutations.apply_batch(user, operations))
+        except Exception as error:
+            if isinstance(error, sqla.exc.DBAPIError) and is_conflict(error):
+                raise
+            current_app.logger.exception('Batch of user %s failed', user.id)
+            results.append(None)
+    if any(result['status'] == 200 for batch_results in results if batch_results for result in batch_results):
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return results
+
+@bp.route('/update_idea', methods=['POST'])
 @login_required
+@limiter.limit
+@retry_on_conflict
 def update_idea():
-    post_id = False
-    created_time = False
     data = request.get_json()[0]
-    idea = Idea.query.get(data['idea_id'])
-    if idea.user_id == current_user.id:
-        idea.name = data['name']
-        if data['text'] != '':
-            post = Post(body = data['text'], created_time = datetime.strptime(data['date'], '%d.%m.%Y %H:%M'), user_id=current_user.id, idea_id=idea.id)
-            post_id = post.id
-            created_time = post.created_time.strftime('%d.%m.%Y %H:%M')
-            db.session.add(post)
-        if data['completed'] in [True, False]:
-            idea.complete = data['completed']
+    user = current_user._get_current_object()
+    # rapid saves of one idea from several requests become one transaction
+    result = coalescer.submit((user.id, str(data.get('idea_id'))), data, lambda updates: save_updates(user, updates))
+    if isinstance(result, mutations.MutationError):
+        return jsonify({'status' : str(result.status), 'post_id' : False, 'created_time' : False}), result.status
+    return jsonify({'status' : '200', 'post_id' : result['post_id'], 'created_time' : result['created_time']})
+
+@bp.route('/api/batch', methods=['POST'])
+@login_required
+@limiter.limit
+@retry_on_conflict
+def batch():
+    operations = request.get_json()
+    if not isinstance(operations, list) or len(operations) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'status' : 400, 'results' : []}), 400
+    user = current_user._get_current_object()
+    # autosaves of one user from several tabs or flushes become one transaction
+    results = coalescer.submit(('batch', user.id), mutations.validate_batch(operations), lambda batches: save_batches(user, batches))
+    if results is None:
+        return jsonify({'status' : 500, 'results' : []}), 500
+    return jsonify({'status' : 200, 'results' : results})
+
+@bp.route('/events')
+@login_required
+def events():
+    response = Response(broker.stream(current_user.id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/export')
+@login_required
+@read_only
+def export_ideas():
+    response = Response(stream_with_context(transfer.export_lines(current_user)), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=einesteine-{current_user.id}.jsonl'
+    return response
+
+@bp.route('/import', methods=['POST'])
+@login_required
+def import_ideas():
+    upload = request.files.get('file')
+    try:
+        stats = transfer.import_lines(current_user, upload.stream if upload is not None else request.stream)
+        broker.publish(current_user, 'resync', {})
         db.session.commit()
-    return jsonify({'status' : '200', 'post_id' : post_id, 'created_time' : created_time})
+    except transfer.TransferError as error:
+        db.session.rollback()
+        return jsonify({'status' : 400, 'error' : str(error)}), 400
+    except sqla.exc.DBAPIError as error:
+        # the upload stream is consumed, the client has to send it again
+        db.session.rollback()
+        if not is_conflict(error):
+            raise
+        return jsonify({'status' : 409, 'error' : 'Conflicting write, please retry'}), 409
+    return jsonify({'status' : 200, 'imported' : stats})
 
-@app.route('/deleteme')
+@bp.route('/deleteme', methods=['POST'])
 @login_required
+@retry_on_conflict
 def delete_account():
-    current_user.ideas.delete()
-    current_user.tags.delete()
-    current_user.posts.delete()
-    db.session.delete(current_user)
+    form = forms.DeleteAccountForm()
+    if not form.validate_on_submit():
+        return redirect(url_for('main.profile'))
+    user = current_user._get_current_object()
+    user.deactivate()
+    jobs.enqueue('delete_account', user, user_id=user.id)
     db.session.commit()
-    return redirect(url_for('register'))
+    logout_user()
+    return redirect(url_for('main.register'))
 
-@app.route('/')
-@app.route('/index')
+def owned_job(job_id):
+    job = Job.query.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return None
+    return job
+
+@bp.route('/jobs/export', methods=['POST'])
+@login_required
+@retry_on_conflict
+def queue_export():
+    job = jobs.enqueue('export', current_user, user_id=current_user.id)
+    db.session.commit()
+    return jsonify({'status' : 200, 'job' : jobs.describe(job)})
+
+@bp.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'status' : 404}), 404
+    return jsonify({'status' : 200, 'job' : jobs.describe(job)})
+
+@bp.route('/jobs/<job_id>/download')
+@login_required
+def job_download(job_id):
+    job = owned_job(job_id)
+    path = jobs.export_path(job) if job is not None and job.state == JOB_DONE else None
+    if path is None:
+        return jsonify({'status' : 404}), 404
+    return send_file(path, mimetype='application/x-ndjson', as_attachment=True,
+                     download_name=f'einesteine-{current_user.id}.jsonl')
+
+@bp.route('/')
+@bp.route('/index')
 def index():
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
+
+def hashing_busy(template, form):
+    return render_template(template, form=form), 429, {'Retry-After' : '1'}
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     form = forms.LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
-            return redirect(url_for('login'))
+        if user is None:
+            return redirect(url_for('main.login'))
+        try:
+            with hasher.slot(request.remote_addr):
+                valid = user.check_password(form.password.data)
+        except HashingBusy:
+            return hashing_busy('login.html', form)
+        if not valid:
+            return redirect(url_for('main.login'))
+        try:
+            db.session.commit()
+        except sqla.exc.DBAPIError as error:
+            # only a password rehash is lost, the next login saves it
+            db.session.rollback()
+            if not is_conflict(error):
+                raise
         login_user(user, remember=True)
         next_page = request.args.get('next')
         if not next_page or url_parse(next_page).netloc != '':
-            next_page = url_for('index')
+            next_page = url_for('main.index')
         return redirect(next_page)
     return render_template('login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
+@retry_on_conflict
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     form = forms.RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data, email=form.email.data, register_time=datetime.now())
-        user.set_password(form.password.data)
+        try:
+            with hasher.slot(request.remote_addr):
+                user.set_password(form.password.data)
+        except HashingBusy:
+            return hashing_busy('register.html', form)
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except sqla.exc.IntegrityError:
+            # a concurrent registration took the name or address, the validators now see it
+            db.session.rollback()
+            form.validate()
+            return render_template('register.html', form=form)
         flash('Congratulations, you are now a registered user!')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', form=form)
 
-@app.route('/board')
+@bp.app_template_global()
+def tag_stats():
+    return cache.cached(cache.user_key(current_user, 'tag_stats'), lambda: queries.tag_stats(current_user))
+
+@bp.app_template_global()
+def idea_card_html(card):
+    """A rendered dashboard card, the key is the card itself so a change to it is a new entry."""
+    return Markup(fragments.cached(('idea_card', card), lambda: render_template('_idea_card.html', card=card)))
+
+def render_dashboard(tag_name, stage, tag_filter):
+    ideas = queries.ideas_page(current_user, tag_name, stage, tags=tag_filter)
+    return render_template('dashboard.html', user=current_user, ideas=ideas, tags=tag_stats(), stage=stage, tag_name=tag_name,
+                           tag_args=queries.tag_filter_args(tag_filter), next_cursor=queries.next_cursor(ideas))
+
+def ideas_payload(tag_name, stage, cursor, page, version=1, tag_filter=queries.NO_TAG_FILTER):
+    if cursor is not None:
+        ideas = queries.ideas_page(current_user, tag_name, stage, cursor=cursor, tags=tag_filter)
+    else:
+        ideas = queries.ideas_page(current_user, tag_name, stage, page, tags=tag_filter)
+    if version == 2:
+        return compact_payload(ideas)
+    if version == 3:
+        return html_payload(ideas)
+    if ideas == []:
+        return {'status' : 200, 'ideas' : None, 'have_new' : False, 'next_cursor' : None}
+    return {'status' : 200,
+            'have_new' : True,
+            'next_cursor' : queries.next_cursor(ideas),
+            'ideas' : [{'id' : card.idea.id,
+                        'name' : card.idea.name,
+                        'number' : card.idea.number,
+                        'complete' : card.idea.complete,
+                        'created_time' : card.idea.created_time.strftime('%d.%m.%Y'),
+                        'posts_count' : card.posts_count,
+                        'url' : url_for('main.editor', idea_id = card.idea.id),
+                        'tags' : [tag.name for tag in card.tags]} for card in ideas]}
+
+IDEA_FIELDS = ['id', 'number', 'name', 'complete', 'created_time', 'posts_count', 'tags']
+
+def compact_payload(ideas):
+    """Version 2: one row per idea in IDEA_FIELDS order, tags by id with the names sent once."""
+    tags = {}
+    rows = []
+    for card in ideas:
+        for tag in card.tags:
+            tags[str(tag.id)] = tag.name
+        rows.append([card.idea.id, card.idea.number, card.idea.name, bool(card.idea.complete),
+                     card.idea.created_time.strftime('%d.%m.%Y'), card.posts_count, [tag.id for tag in card.tags]])
+    return {'v' : 2, 'status' : 200, 'fields' : IDEA_FIELDS, 'tags' : tags, 'ideas' : rows,
+            'next_cursor' : queries.next_cursor(ideas)}
+
+def html_payload(ideas):
+    """Version 3: the cards as HTML for the board to append."""
+    return {'v' : 3, 'status' : 200, 'html' : ''.join(idea_card_html(card) for card in ideas),
+            'next_cursor' : queries.next_cursor(ideas)}
+
+@bp.route('/board')
 @login_required
+@read_only
 def dashboard():
-    ideas = current_user.ideas.paginate(1, 50, False).items if current_user.ideas != None else None
-    return render_template('dashboard.html', user=current_user, ideas=ideas, tags=current_user.tags.all(), tag_name='none', stage='none')
+    tag_filter = queries.parse_tag_filter(request.args)
+    return cache.cached(cache.user_key(current_user, 'board', 'none', 'none', tag_filter),
+                        lambda: render_dashboard('none', 'none', tag_filter))
 
-@app.route('/board/filtered/<tag_name>/<stage>')
+@bp.route('/board/filtered/<tag_name>/<stage>')
 @login_required
+@read_only
 def dashboard_filtered(tag_name, stage):
-    ideas = []
-    if tag_name != 'none':
-        tag = Tag.query.filter_by(name = tag_name, user_id = current_user.id).first()
-        ideas = tag.ideas
-    elif tag_name == 'none':
-        ideas = current_user.ideas
-    if stage != 'none' and ideas != None:
-        if stage == '1':
-            ideas = ideas.filter(sqla.and_(Idea.complete == False, Idea.posts == None))
-        if stage == '2':
-            ideas = ideas.filter(sqla.and_(Idea.complete == False, Idea.posts != None))
-        if stage == '3':
-            ideas = ideas.filter(Idea.complete)
-    if ideas != None:
-        ideas = ideas.paginate(1, 50, False).items
-    else:
-        ideas = []
-    return render_template('dashboard.html', user=current_user, ideas=ideas, tags=current_user.tags.all(), tagn = False, stage=stage, tag_name=tag_name)
+    tag_filter = queries.parse_tag_filter(request.args)
+    return cache.cached(cache.user_key(current_user, 'board', tag_name, stage, tag_filter),
+                        lambda: render_dashboard(tag_name, stage, tag_filter))
 
-@app.route('/get_ideas/<tag_name>/<stage>', methods=['POST'])
+@bp.route('/get_ideas/<tag_name>/<stage>', methods=['GET', 'POST'])
 @login_required
+@read_only
 def get_ideas_page(tag_name, stage):
-    data = request.get_json()[0]
-    if tag_name != 'none':
-        tag = Tag.query.filter_by(name = tag_name, user_id = current_user.id).first()
-        if tag != None or tag.ideas != None:
-            ideas = tag.ideas
-        else:
-            ideas = current_user.ideas
-    else:
-        ideas = current_user.ideas
-
-    if stage != 'none':
-        if stage == '1':
-            ideas = ideas.filter(sqla.and_(Idea.complete == False, Idea.posts == None))
-        if stage == '2':
-            ideas = ideas.filter(sqla.and_(Idea.complete == False, Idea.posts != None))
-        if stage == '3':
-            ideas = ideas.filter(Idea.complete)
-
-    ideas = ideas.paginate(int(data['next_page']), 50, False).items
-    if ideas == None or ideas == []:
-        return jsonify({'status' : 200, 'ideas' : None, 'have_new' : False})
-    ideas = [{'id' : idea.id,
-              'name' : idea.name,
-              'number' : idea.number,
-              'complete' : idea.complete,
-              'created_time' : idea.created_time.strftime('%d.%m.%Y'),
-              'posts_count' : len(idea.posts.all()),
-              'url' : url_for('editor', idea_id = idea.id),
-              'tags' : [tag.name for tag in idea.tags]} for idea in ideas]
-    return jsonify({'status' : 200, 'ideas' : ideas, 'have_new' : True})
-
-@app.route('/editor')
+    if request.method == 'GET' and wire.not_modified(current_user):
+        return wire.not_modified_response(current_user)
+    data = request.args if request.method == 'GET' else request.get_json()[0]
+    try:
+        version = int(data.get('v', 1))
+        cursor = data.get('cursor')
+        page = int(data.get('page', 1) if request.method == 'GET' else data['next_page']) if cursor is None else None
+        tag_filter = queries.parse_tag_filter(data)
+        payload = cache.cached(cache.user_key(current_user, 'ideas', tag_name, stage, cursor, page, version, tag_filter),
+                               lambda: ideas_payload(tag_name, stage, cursor, page, version, tag_filter))
+    except (KeyError, ValueError, AttributeError):
+        return jsonify({'status' : 400, 'ideas' : None, 'have_new' : False}), 400
+    return wire.json_response(payload, current_user)
+
+@bp.route('/api/tags/stats')
+@login_required
+@read_only
+def tags_stats():
+    return wire.json_response({'status' : 200,
+                               'tags' : [{'id' : tag.id,
+                                          'name' : tag.name,
+                                          'ideas' : tag.ideas_count,
+                                          'stages' : {'new' : tag.new, 'in_progress' : tag.in_progress, 'complete' : tag.complete},
+                                          'last_activity' : tag.last_activity.isoformat() if tag.last_activity else None}
+                                         for tag in tag_stats()]})
+
+@bp.route('/search')
 @login_required
+@read_only
+def search_ideas():
+    if not search.is_supported():
+        return jsonify({'status' : 501, 'results' : []}), 501
+    results = search.search(current_user, request.args.get('q', ''), request.args.get('tag_name', 'none'), request.args.get('stage', 'none'),
+                            tags=queries.parse_tag_filter(request.args))
+    for result in results:
+        result['url'] = url_for('main.editor', idea_id = result['id'])
+    return jsonify({'status' : 200, 'results' : results})
+
+@bp.route('/editor')
+@login_required
+@retry_on_conflict
 def editor_empty():
-    number = current_user.last_idea_id
+    number = reserve_numbers(current_user.id, 1)
     idea = Idea(name = 'Моя шикарная идея', created_time = datetime.now(), user_id = current_user.id, number = number)
-    current_user.last_idea_id = number + 1
     db.session.add(idea)
+    db.session.flush()
+    card = queries.IdeaCard(queries.IdeaRow(idea.id, idea.number, idea.name, False, idea.created_time), 0, ())
+    broker.publish(current_user, 'idea.created', {'id' : idea.id, 'number' : idea.number, 'name' : idea.name,
+                                                  'created_time' : idea.created_time.strftime('%d.%m.%Y'),
+                                                  'html' : idea_card_html(card)})
+    current_user.bump_data_version()
     db.session.commit()
-    return redirect(url_for('editor', idea_id = idea.id))
+    return redirect(url_for('main.editor', idea_id = idea.id))
 
-@app.route('/editor/<idea_id>')
+@bp.route('/editor/<idea_id>')
 @login_required
+@read_only
 def editor(idea_id):
     idea = Idea.query.get(idea_id)
-    tags = Tag.query.filter_by(user_id=current_user.id).all()
     if idea is not None and idea.user_id == current_user.id:
-        return render_template('editor.html', idea = idea, tags = tags)
+        posts = queries.posts_page(idea.id)
+        return render_template('editor.html', idea = idea, tags = queries.sidebar_tags(current_user),
+                               idea_tags = queries.tags_by_idea([idea.id])[idea.id],
+                               posts = posts, older_cursor = queries.older_posts_cursor(posts))
     else:
-        return redirect(url_for('logout'))
+        return redirect(url_for('main.logout'))
+
+@bp.route('/editor/<idea_id>/posts')
+@login_required
+@read_only
+def editor_posts(idea_id):
+    idea = Idea.query.get(idea_id)
+    if idea is None or idea.user_id != current_user.id:
+        return jsonify({'status' : 404}), 404
+    try:
+        posts = queries.posts_page(idea.id, cursor=request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'status' : 400}), 400
+    return jsonify({'status' : 200,
+                    'next_cursor' : queries.older_posts_cursor(posts),
+                    'posts' : [{'id' : post.id,
+                                'body' : post.body,
+                                'created_time' : post.created_time.strftime('%d.%m.%Y %H:%M')} for post in posts]})
 
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     form = forms.DeleteAccountForm()
-    if form.validate_on_submit():
-        return redirect(url_for('register'))
-    return render_template('account.html', user=current_user, form=form)
+    recent_jobs = Job.query.filter(Job.user_id == current_user.id).order_by(Job.id.desc()).limit(5)
+    return render_template('account.html', user=current_user, form=form, jobs=[jobs.describe(job) for job in recent_jobs])
@@ -0,0 +1,93 @@
+from einesteine import db
+import sqlalchemy as sqla
+from markupsafe import escape
+from einesteine.models import Idea, Post
+from einesteine.queries import filter_ideas, NO_TAG_FILTER
+
+
+
+RESULTS_LIMIT = 20
+SNIPPET_TOKENS = 16
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS idea_search USING fts5(name, content='idea', content_rowid='id', tokenize='unicode61 remove_diacritics 0')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5(body, content='post', content_rowid='id', tokenize='unicode61 remove_diacritics 0')",
+    "CREATE TRIGGER IF NOT EXISTS idea_search_ai AFTER INSERT ON idea BEGIN "
+    "INSERT INTO idea_search(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS idea_search_ad AFTER DELETE ON idea BEGIN "
+    "INSERT INTO idea_search(idea_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS idea_search_au AFTER UPDATE OF name ON idea BEGIN "
+    "INSERT INTO idea_search(idea_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO idea_search(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS post_search_ai AFTER INSERT ON post BEGIN "
+    "INSERT INTO post_search(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS post_search_ad AFTER DELETE ON post BEGIN "
+    "INSERT INTO post_search(post_search, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS post_search_au AFTER UPDATE OF body ON post BEGIN "
+    "INSERT INTO post_search(post_search, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO post_search(rowid, body) VALUES (new.id, new.body); END",
+]
+
+DROP_SCHEMA = [
+    'DROP TRIGGER IF EXISTS idea_search_ai',
+    'DROP TRIGGER IF EXISTS idea_search_ad',
+    'DROP TRIGGER IF EXISTS idea_search_au',
+    'DROP TRIGGER IF EXISTS post_search_ai',
+    'DROP TRIGGER IF EXISTS post_search_ad',
+    'DROP TRIGGER IF EXISTS post_search_au',
+    'DROP TABLE IF EXISTS idea_search',
+    'DROP TABLE IF EXISTS post_search',
+]
+
+idea_search = sqla.table('idea_search', sqla.column('rowid'), sqla.column('rank'))
+post_search = sqla.table('post_search', sqla.column('rowid'), sqla.column('rank'))
+
+
+def is_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+def create_index(connection):
+    for statement in SCHEMA:
+        connection.execute(sqla.text(statement))
+
+def rebuild_index():
+    with db.engine.begin() as connection:
+        for statement in DROP_SCHEMA:
+            connection.execute(sqla.text(statement))
+        create_index(connection)
+        connection.execute(sqla.text("INSERT INTO idea_search(idea_search) VALUES ('rebuild')"))
+        connection.execute(sqla.text("INSERT INTO post_search(post_search) VALUES ('rebuild')"))
+
+def match_expression(text):
+    terms = ['"' + term.replace('"', '""') + '"*' for term in text.split()]
+    return ' '.join(terms)
+
+def render_snippet(snippet):
+    return str(escape(snippet or '')).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+def search(user, text, tag_name='none', stage='none', limit=RESULTS_LIMIT, tags=NO_TAG_FILTER):
+    match = match_expression(text)
+    if not match:
+        return []
+    idea_hits = filter_ideas(user, tag_name, stage, tags) \
+                    .join(idea_search, idea_search.c.rowid == Idea.id) \
+                    .filter(sqla.literal_column('idea_search').match(match)) \
+                    .with_entities(Idea.id, Idea.name, Idea.number, idea_search.c.rank,
+                                   sqla.func.highlight(sqla.literal_column('idea_search'), 0, HIGHLIGHT_START, HIGHLIGHT_END)) \
+                    .order_by(idea_search.c.rank) \
+                    .limit(limit)
+    post_hits = filter_ideas(user, tag_name, stage, tags) \
+                    .join(Post, Post.idea_id == Idea.id) \
+                    .join(post_search, post_search.c.rowid == Post.id) \
+                    .filter(sqla.literal_column('post_search').match(match)) \
+                    .with_entities(Idea.id, Idea.name, Idea.number, post_search.c.rank,
+                                   sqla.func.snippet(sqla.literal_column('post_search'), 0, HIGHLIGHT_START, HIGHLIGHT_END, '…', SNIPPET_TOKENS)) \
+                    .order_by(post_search.c.rank) \
+                    .limit(limit)
+    results = {}
+    for idea_id, name, number, rank, snippet in sorted(idea_hits.all() + post_hits.all(), key=lambda hit: hit[3]):
+        if idea_id not in results and len(results) < limit:
+            results[idea_id] = {'id' : idea_id, 'name' : name, 'number' : number, 'rank' : rank, 'snippet' : render_snippet(snippet)}
+    return list(results.values())
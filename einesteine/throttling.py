@@ -0,0 +1,193 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify
+from flask_login import current_user
+
+
+
+class MemoryBackend(object):
+    """Token buckets of one process, every worker process limits on its own."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take a token, returns 0 when allowed, else the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, full = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.maxsize:
+                self.prune(now)
+            return wait
+
+    def prune(self, now):
+        # A bucket that has refilled is the same as no bucket at all.
+        self._buckets = {key : bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class NullBackend(object):
+    def __init__(self, maxsize=0):
+        pass
+
+    def take(self, key, rate, burst):
+        return 0
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+BACKENDS = {'memory' : MemoryBackend, 'null' : NullBackend}
+
+
+class RateLimiter(object):
+    """Token bucket per user and endpoint.
+
+    RATELIMIT_LIMITS maps an endpoint to (tokens per second, burst); views
+    wrapped in limit() answer 429 with Retry-After once the bucket is empty,
+    endpoints without an entry are not limited.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.limits = {}
+        self.allowed = {}
+        self.rejected = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RATELIMIT_BACKEND', 'memory')
+        if isinstance(backend, str):
+            backend = BACKENDS[backend]
+        self.backend = backend(maxsize=app.config.get('RATELIMIT_SIZE', 10000))
+        self.limits = dict(app.config.get('RATELIMIT_LIMITS') or {})
+        app.extensions['rate_limiter'] = self
+
+    def count(self, counters, endpoint):
+        with self.lock:
+            counters[endpoint] = counters.get(endpoint, 0) + 1
+
+    def limit(self, view):
+        @wraps(view)
+        def limited(*args, **kwargs):
+            endpoint = request.endpoint
+            if endpoint not in self.limits:
+                return view(*args, **kwargs)
+            rate, burst = self.limits[endpoint]
+            wait = self.backend.take((current_user.id, endpoint), rate, burst)
+            if wait:
+                self.count(self.rejected, endpoint)
+                response = jsonify({'status' : '429'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                return response
+            self.count(self.allowed, endpoint)
+            return view(*args, **kwargs)
+        return limited
+
+    def stats(self):
+        with self.lock:
+            return {'backend' : type(self.backend).__name__,
+                    'buckets' : len(self.backend),
+                    'allowed' : dict(self.allowed),
+                    'rejected' : dict(self.rejected)}
+
+
+class Group(object):
+    def __init__(self, previous):
+        self.previous = previous
+        self.payloads = []
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Coalescer(object):
+    """Merges concurrent writes to the same key into one transaction.
+
+    The first request for a key leads a group: it waits for the group
+    already writing that key, plus COALESCE_WINDOW seconds, then hands every
+    payload that joined meanwhile to one apply() call. The other requests
+    of the group block until it is done and answer with their own result.
+    A leader with nothing else queued for its key writes right away.
+    """
+
+    def __init__(self, app=None):
+        self.window = 0
+        self.open = {}
+        self.running = {}
+        self.requests = 0
+        self.writes = 0
+        self.largest = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.window = app.config.get('COALESCE_WINDOW', 0)
+        app.extensions['coalescer'] = self
+
+    def submit(self, key, payload, apply):
+        with self.lock:
+            self.requests += 1
+            group = self.open.get(key)
+            leader = group is None
+            if leader:
+                group = self.open[key] = Group(self.running.get(key))
+            index = len(group.payloads)
+            group.payloads.append(payload)
+        if not leader:
+            group.done.wait()
+            if group.error is not None:
+                raise group.error
+            return group.results[index]
+        contended = group.previous is not None
+        if contended:
+            group.previous.done.wait()
+        with self.lock:
+            contended = contended or len(group.payloads) > 1
+        if self.window and contended:
+            time.sleep(self.window)
+        with self.lock:
+            del self.open[key]
+            self.running[key] = group
+            self.writes += 1
+            self.largest = max(self.largest, len(group.payloads))
+        try:
+            group.results = apply(group.payloads)
+        except Exception as error:
+            group.error = error
+            raise
+        finally:
+            with self.lock:
+                if self.running.get(key) is group:
+                    del self.running[key]
+            group.done.set()
+        return group.results[index]
+
+    def stats(self):
+        with self.lock:
+            return {'requests' : self.requests,
+                    'writes' : self.writes,
+                    'merged' : self.requests - self.writes,
+                    'largest_group' : self.largest}
@@ -0,0 +1,159 @@
+from einesteine import db
+import json
+from datetime import datetime
+from einesteine.models import Tag, Idea, Post, tag_connections, refresh_counters, reserve_numbers, bump_data_version, STAGE_NEW, STAGE_COMPLETE
+
+
+
+FORMAT_VERSION = 1
+EXPORT_CHUNK = 500
+IMPORT_BATCH = 500
+
+
+class TransferError(Exception):
+    pass
+
+
+def dump_time(value):
+    return value.isoformat() if value is not None else None
+
+def load_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+def export_records(user):
+    yield {'type' : 'export', 'version' : FORMAT_VERSION, 'username' : user.username}
+    tags = db.session.query(Tag.id, Tag.name).filter(Tag.user_id == user.id).order_by(Tag.id)
+    for tag_id, name in tags.yield_per(EXPORT_CHUNK):
+        yield {'type' : 'tag', 'id' : tag_id, 'name' : name}
+    ideas = db.session.query(Idea.id, Idea.number, Idea.name, Idea.complete, Idea.created_time) \
+                      .filter(Idea.user_id == user.id).order_by(Idea.id)
+    for idea_id, number, name, complete, created_time in ideas.yield_per(EXPORT_CHUNK):
+        yield {'type' : 'idea', 'id' : idea_id, 'number' : number, 'name' : name,
+               'complete' : bool(complete), 'created_time' : dump_time(created_time)}
+    posts = db.session.query(Post.idea_id, Post.body, Post.created_time) \
+                      .join(Idea, Idea.id == Post.idea_id) \
+                      .filter(Idea.user_id == user.id).order_by(Post.id)
+    for idea_id, body, created_time in posts.yield_per(EXPORT_CHUNK):
+        yield {'type' : 'post', 'idea_id' : idea_id, 'body' : body, 'created_time' : dump_time(created_time)}
+    connections = db.session.query(tag_connections.c.tagged_id, tag_connections.c.tag_id) \
+                            .join(Idea, Idea.id == tag_connections.c.tagged_id) \
+                            .filter(Idea.user_id == user.id)
+    for idea_id, tag_id in connections.yield_per(EXPORT_CHUNK):
+        yield {'type' : 'connection', 'idea_id' : idea_id, 'tag_id' : tag_id}
+
+def export_lines(user):
+    for record in export_records(user):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Importer(object):
+    def __init__(self, user, batch_size=IMPORT_BATCH):
+        self.user_id = user.id
+        self.batch_size = batch_size
+        self.tag_ids = {}
+        self.idea_ids = {}
+        self.ideas = []
+        self.posts = []
+        self.connections = []
+        self.connected = set()
+        self.existing_tags = {name : tag_id for tag_id, name in db.session.query(Tag.id, Tag.name).filter(Tag.user_id == user.id)}
+        self.stats = {'tags' : 0, 'ideas' : 0, 'posts' : 0, 'connections' : 0}
+
+    def add(self, record):
+        kind = record.get('type')
+        if kind == 'export':
+            if record.get('version', FORMAT_VERSION) > FORMAT_VERSION:
+                raise ValueError(f"unsupported export version {record['version']}")
+        elif kind == 'tag':
+            self.add_tag(record)
+        elif kind == 'idea':
+            self.ideas.append({'id' : record['id'],
+                               'name' : str(record['name'])[:140],
+                               'complete' : bool(record.get('complete')),
+                               'created_time' : load_time(record.get('created_time')) or datetime.now()})
+            if len(self.ideas) >= self.batch_size:
+                self.flush_ideas()
+        elif kind == 'post':
+            self.flush_ideas()
+            idea_id = self.idea_ids.get(record['idea_id'])
+            if idea_id is not None:
+                self.posts.append({'body' : str(record['body'])[:3000], 'created_time' : load_time(record.get('created_time')) or datetime.now(),
+                                   'idea_id' : idea_id, 'user_id' : self.user_id})
+            if len(self.posts) >= self.batch_size:
+                self.flush_posts()
+        elif kind == 'connection':
+            self.flush_ideas()
+            idea_id = self.idea_ids.get(record['idea_id'])
+            tag_id = self.tag_ids.get(record['tag_id'])
+            if idea_id is not None and tag_id is not None and (idea_id, tag_id) not in self.connected:
+                self.connected.add((idea_id, tag_id))
+                self.connections.append({'tagged_id' : idea_id, 'tag_id' : tag_id})
+            if len(self.connections) >= self.batch_size:
+                self.flush_connections()
+
+    def add_tag(self, record):
+        name = str(record['name'])[:25]
+        tag_id = self.existing_tags.get(name)
+        if tag_id is None:
+            tag = Tag(name=name, user_id=self.user_id)
+            db.session.add(tag)
+            db.session.flush()
+            tag_id = self.existing_tags[name] = tag.id
+            self.stats['tags'] += 1
+        self.tag_ids[record['id']] = tag_id
+
+    def flush_ideas(self):
+        if not self.ideas:
+            return
+        first = reserve_numbers(self.user_id, len(self.ideas))
+        rows = [{'name' : record['name'],
+                 'number' : first + i,
+                 'complete' : record['complete'],
+                 'stage' : STAGE_COMPLETE if record['complete'] else STAGE_NEW,
+                 'post_count' : 0,
+                 'created_time' : record['created_time'],
+                 'user_id' : self.user_id} for i, record in enumerate(self.ideas)]
+        db.session.execute(Idea.__table__.insert(), rows)
+        numbers = dict(db.session.query(Idea.number, Idea.id)
+                                 .filter(Idea.user_id == self.user_id,
+                                         Idea.number.between(first, first + len(rows) - 1))
+                                 .order_by(Idea.id))
+        for i, record in enumerate(self.ideas):
+            self.idea_ids[record['id']] = numbers[first + i]
+        self.stats['ideas'] += len(rows)
+        self.ideas = []
+
+    def flush_posts(self):
+        if self.posts:
+            db.session.execute(Post.__table__.insert(), self.posts)
+            self.stats['posts'] += len(self.posts)
+            self.posts = []
+
+    def flush_connections(self):
+        if self.connections:
+            db.session.execute(tag_connections.insert(), self.connections)
+            self.stats['connections'] += len(self.connections)
+            self.connections = []
+
+    def finish(self):
+        self.flush_ideas()
+        self.flush_posts()
+        self.flush_connections()
+        refresh_counters(self.user_id)
+        bump_data_version(self.user_id)
+        return self.stats
+
+def import_lines(user, lines, batch_size=IMPORT_BATCH):
+    importer = Importer(user, batch_size)
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            importer.add(json.loads(line))
+        except KeyError as error:
+            raise TransferError(f'Line {number}: missing field {error}')
+        except (ValueError, TypeError, AttributeError) as error:
+            raise TransferError(f'Line {number}: {error}')
+    return importer.finish()
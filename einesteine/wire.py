@@ -0,0 +1,63 @@
+import gzip
+import json
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+def content_encoding():
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(encodings)
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=current_app.config.get('COMPRESS_BROTLI_QUALITY', 5))
+    return gzip.compress(body, compresslevel=current_app.config.get('COMPRESS_GZIP_LEVEL', 6))
+
+def validators(user):
+    return f'{user.id}-{user.data_version}', user.data_modified
+
+def not_modified(user):
+    etag, last_modified = validators(user)
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+def set_validators(response, user):
+    etag, last_modified = validators(user)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.update(('Accept-Encoding', 'Cookie'))
+    return response
+
+def not_modified_response(user):
+    return set_validators(current_app.response_class(status=304), user)
+
+def json_response(payload, user=None, status=200):
+    """Serialize and compress a JSON payload, with validators for user."""
+    body = dumps(payload)
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    encoding = content_encoding() if len(body) >= current_app.config.get('COMPRESS_MIN_SIZE', 1024) else None
+    if encoding is not None:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    if user is not None:
+        set_validators(response, user)
+    else:
+        response.vary.add('Accept-Encoding')
+    return response
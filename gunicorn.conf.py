@@ -0,0 +1,14 @@
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:8000'
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+# every open /events stream holds a thread for up to EVENTS_MAX_AGE seconds
+threads = int(os.environ.get('GUNICORN_THREADS') or 8)
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 1000)
+max_requests_jitter = 100
+# every worker builds its own app and engine, no connection crosses a fork
+preload_app = False
+accesslog = '-'
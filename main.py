@@ -1,3 +1,9 @@
-from einesteine import app
+import os
+from einesteine import create_app, jobs
 
-app.run(debug = True)
+app = create_app()
+# hashing pool processes import this module again, only the script serves
+if __name__ == '__main__':
+    if app.config['JOBS_WORKER_THREADS']:
+        jobs.start_threads(app, app.config['JOBS_WORKER_THREADS'])
+    app.run(debug = os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,40 @@
+"""denormalized idea stage and counters
+
+Revision ID: 3e8047fbabd2
+Revises: c425dfa75fe8
+Create Date: 2026-10-18 11:02:17.540931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8047fbabd2'
+down_revision = 'c425dfa75fe8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('idea', sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('idea', sa.Column('last_post_time', sa.DateTime(), nullable=True))
+    op.add_column('idea', sa.Column('stage', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('tag', sa.Column('idea_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_idea_user_id_stage', 'idea', ['user_id', 'stage'], unique=False)
+
+    op.execute('UPDATE idea SET '
+               'post_count = (SELECT count(*) FROM post WHERE post.idea_id = idea.id), '
+               'last_post_time = (SELECT max(post.created_time) FROM post WHERE post.idea_id = idea.id)')
+    op.execute('UPDATE idea SET stage = CASE WHEN complete THEN 3 WHEN post_count > 0 THEN 2 ELSE 1 END')
+    op.execute('UPDATE tag SET idea_count = (SELECT count(*) FROM tag_connections '
+               'JOIN idea ON idea.id = tag_connections.tagged_id '
+               'WHERE tag_connections.tag_id = tag.id)')
+
+
+def downgrade():
+    op.drop_index('ix_idea_user_id_stage', table_name='idea')
+    op.drop_column('tag', 'idea_count')
+    op.drop_column('idea', 'stage')
+    op.drop_column('idea', 'last_post_time')
+    op.drop_column('idea', 'post_count')
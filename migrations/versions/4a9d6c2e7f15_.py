@@ -0,0 +1,36 @@
+"""tag filter indexes and unique tag connections
+
+Revision ID: 4a9d6c2e7f15
+Revises: 8e4c1a7f2b93
+Create Date: 2026-10-18 15:48:31.027745
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4a9d6c2e7f15'
+down_revision = '8e4c1a7f2b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # concurrent connects could insert the same pair twice, keep one row of each
+    op.execute('CREATE TABLE tag_connections_unique AS SELECT DISTINCT tagged_id, tag_id FROM tag_connections')
+    op.execute('DELETE FROM tag_connections')
+    op.execute('INSERT INTO tag_connections (tagged_id, tag_id) SELECT tagged_id, tag_id FROM tag_connections_unique')
+    op.execute('DROP TABLE tag_connections_unique')
+    op.execute('UPDATE tag SET idea_count = (SELECT count(*) FROM tag_connections '
+               'JOIN idea ON idea.id = tag_connections.tagged_id '
+               'WHERE tag_connections.tag_id = tag.id)')
+
+    op.create_index('uq_tag_connections_tag_id_tagged_id', 'tag_connections', ['tag_id', 'tagged_id'], unique=True)
+    op.create_index(op.f('ix_tag_connections_tagged_id'), 'tag_connections', ['tagged_id'], unique=False)
+    op.create_index('ix_tag_user_id_name', 'tag', ['user_id', 'name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tag_user_id_name', table_name='tag')
+    op.drop_index(op.f('ix_tag_connections_tagged_id'), table_name='tag_connections')
+    op.drop_index('uq_tag_connections_tag_id_tagged_id', table_name='tag_connections')
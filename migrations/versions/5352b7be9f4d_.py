@@ -0,0 +1,48 @@
+"""full-text search index for ideas and posts
+
+Revision ID: 5352b7be9f4d
+Revises: 3e8047fbabd2
+Create Date: 2026-10-18 12:24:53.190465
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5352b7be9f4d'
+down_revision = '3e8047fbabd2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE idea_search USING fts5(name, content='idea', content_rowid='id', tokenize='unicode61 remove_diacritics 0')")
+    op.execute("CREATE VIRTUAL TABLE post_search USING fts5(body, content='post', content_rowid='id', tokenize='unicode61 remove_diacritics 0')")
+    op.execute("CREATE TRIGGER idea_search_ai AFTER INSERT ON idea BEGIN "
+               "INSERT INTO idea_search(rowid, name) VALUES (new.id, new.name); END")
+    op.execute("CREATE TRIGGER idea_search_ad AFTER DELETE ON idea BEGIN "
+               "INSERT INTO idea_search(idea_search, rowid, name) VALUES ('delete', old.id, old.name); END")
+    op.execute("CREATE TRIGGER idea_search_au AFTER UPDATE OF name ON idea BEGIN "
+               "INSERT INTO idea_search(idea_search, rowid, name) VALUES ('delete', old.id, old.name); "
+               "INSERT INTO idea_search(rowid, name) VALUES (new.id, new.name); END")
+    op.execute("CREATE TRIGGER post_search_ai AFTER INSERT ON post BEGIN "
+               "INSERT INTO post_search(rowid, body) VALUES (new.id, new.body); END")
+    op.execute("CREATE TRIGGER post_search_ad AFTER DELETE ON post BEGIN "
+               "INSERT INTO post_search(post_search, rowid, body) VALUES ('delete', old.id, old.body); END")
+    op.execute("CREATE TRIGGER post_search_au AFTER UPDATE OF body ON post BEGIN "
+               "INSERT INTO post_search(post_search, rowid, body) VALUES ('delete', old.id, old.body); "
+               "INSERT INTO post_search(rowid, body) VALUES (new.id, new.body); END")
+    op.execute("INSERT INTO idea_search(idea_search) VALUES ('rebuild')")
+    op.execute("INSERT INTO post_search(post_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ['idea_search_ai', 'idea_search_ad', 'idea_search_au',
+                    'post_search_ai', 'post_search_ad', 'post_search_au']:
+        op.execute(f'DROP TRIGGER {trigger}')
+    op.execute('DROP TABLE post_search')
+    op.execute('DROP TABLE idea_search')
@@ -0,0 +1,43 @@
+"""unique idea numbers per user
+
+Revision ID: 7c3e9b1d5a28
+Revises: 4a9d6c2e7f15
+Create Date: 2026-10-18 17:12:05.483916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9b1d5a28'
+down_revision = '4a9d6c2e7f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # two editors opened at once could give ideas the same number, the
+    # oldest idea keeps it and the others move past the user's highest number
+    connection = op.get_bind()
+    next_numbers = {user_id : max(last_idea_id or 1, (highest or 0) + 1) for user_id, last_idea_id, highest in connection.execute(sa.text(
+        'SELECT "user".id, "user".last_idea_id, (SELECT max(number) FROM idea WHERE idea.user_id = "user".id) FROM "user"'))}
+    duplicates = connection.execute(sa.text(
+        'SELECT idea.id, idea.user_id FROM idea '
+        'WHERE EXISTS (SELECT 1 FROM idea AS other WHERE other.user_id = idea.user_id '
+        'AND other.number = idea.number AND other.id < idea.id) '
+        'ORDER BY idea.user_id, idea.id')).fetchall()
+    for idea_id, user_id in duplicates:
+        connection.execute(sa.text('UPDATE idea SET number = :number WHERE id = :id'),
+                           {'number' : next_numbers[user_id], 'id' : idea_id})
+        next_numbers[user_id] += 1
+    # reserve_numbers counts on last_idea_id being past every number in use
+    for user_id, number in next_numbers.items():
+        connection.execute(sa.text('UPDATE "user" SET last_idea_id = :number WHERE id = :user_id'),
+                           {'number' : number, 'user_id' : user_id})
+
+    op.create_index('uq_idea_user_id_number', 'idea', ['user_id', 'number'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_idea_user_id_number', table_name='idea')
@@ -0,0 +1,49 @@
+"""background jobs and account deactivation
+
+Revision ID: 8e4c1a7f2b93
+Revises: d3f58a0c6e21
+Create Date: 2026-10-18 15:12:08.493306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4c1a7f2b93'
+down_revision = 'd3f58a0c6e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('state', sa.String(length=16), nullable=False),
+    sa.Column('progress', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_time', sa.DateTime(), nullable=True),
+    sa.Column('started_time', sa.DateTime(), nullable=True),
+    sa.Column('finished_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_state_id', 'job', ['state', 'id'], unique=False)
+    op.create_index(op.f('ix_job_user_id'), 'job', ['user_id'], unique=False)
+    op.add_column('user', sa.Column('active', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    # accounts deleted before the job queue left their tag connections behind
+    op.execute('DELETE FROM tag_connections WHERE tagged_id IS NULL OR tag_id IS NULL '
+               'OR tagged_id NOT IN (SELECT id FROM idea) OR tag_id NOT IN (SELECT id FROM tag)')
+
+
+def downgrade():
+    op.drop_column('user', 'active')
+    op.drop_index(op.f('ix_job_user_id'), table_name='job')
+    op.drop_index('ix_job_state_id', table_name='job')
+    op.drop_table('job')
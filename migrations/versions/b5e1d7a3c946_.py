@@ -0,0 +1,44 @@
+"""unique tag names per user
+
+Revision ID: b5e1d7a3c946
+Revises: 7c3e9b1d5a28
+Create Date: 2026-10-18 18:26:40.715203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d7a3c946'
+down_revision = '7c3e9b1d5a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # concurrent add_tag calls could create the same tag twice, the oldest
+    # tag takes over the connections of the others
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text(
+        'SELECT tag.id, (SELECT min(other.id) FROM tag AS other WHERE other.user_id = tag.user_id AND other.name = tag.name) '
+        'FROM tag WHERE EXISTS (SELECT 1 FROM tag AS other WHERE other.user_id = tag.user_id '
+        'AND other.name = tag.name AND other.id < tag.id)')).fetchall()
+    for tag_id, kept_id in duplicates:
+        connection.execute(sa.text(
+            'UPDATE tag_connections SET tag_id = :kept_id WHERE tag_id = :tag_id AND tagged_id NOT IN '
+            '(SELECT tagged_id FROM tag_connections WHERE tag_id = :kept_id)'), {'tag_id' : tag_id, 'kept_id' : kept_id})
+        connection.execute(sa.text('DELETE FROM tag_connections WHERE tag_id = :tag_id'), {'tag_id' : tag_id})
+        connection.execute(sa.text('DELETE FROM tag WHERE id = :tag_id'), {'tag_id' : tag_id})
+    if duplicates:
+        op.execute('UPDATE tag SET idea_count = (SELECT count(*) FROM tag_connections '
+                   'JOIN idea ON idea.id = tag_connections.tagged_id '
+                   'WHERE tag_connections.tag_id = tag.id)')
+
+    op.drop_index('ix_tag_user_id_name', table_name='tag')
+    op.create_index('uq_tag_user_id_name', 'tag', ['user_id', 'name'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_tag_user_id_name', table_name='tag')
+    op.create_index('ix_tag_user_id_name', 'tag', ['user_id', 'name'], unique=False)
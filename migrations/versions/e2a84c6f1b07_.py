@@ -0,0 +1,24 @@
+"""job heartbeat
+
+Revision ID: e2a84c6f1b07
+Revises: b5e1d7a3c946
+Create Date: 2026-10-18 18:54:12.309562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a84c6f1b07'
+down_revision = 'b5e1d7a3c946'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job', sa.Column('heartbeat_time', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('job', 'heartbeat_time')
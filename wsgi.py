@@ -0,0 +1,3 @@
+from einesteine import create_app
+
+app = create_app()